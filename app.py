@@ -1,7 +1,10 @@
+import json
 import os
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 from werkzeug.utils import secure_filename
 from flask_cors import CORS
+import urllib.error
+import urllib.request
 from urllib.parse import quote
 from backend.faiss_index import DEFAULT_DATA_DIR
 from flask import send_from_directory
@@ -11,13 +14,31 @@ from flask import send_file, abort
 from backend.embedding import (
     create_index,
     embed_text,
+    embed_texts,
     ingest_image_file,
+    model_status,
+    preload_models,
+    start_warmup,
+    text_batcher_stats,
+    text_cache_stats,
+    _normalize_prompt,
+)
+from backend.faiss_index import DEFAULT_IMAGES_DIR, DESCRIPTION_SOURCES
+from backend.captioning import CaptionQueue
+from backend.lru_cache import LRUCache
+from backend.rerank import rerank, rerank_batch
+from backend.thumbnails import existing_thumbnails, remove_thumbnails
+from backend.people_db import (
+    init_db,
+    get_person,
+    get_person_by_name,
+    create_or_update_person,
+    parse_since,
+    person_cache_stats,
 )
-from backend.faiss_index import DEFAULT_IMAGES_DIR
-from backend.people_db import init_db, get_person, get_person_by_name, create_or_update_person
 
 import random
-import numpy as np
+import time
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
 CORS(app, origins=[
@@ -27,25 +48,142 @@ CORS(app, origins=[
     "http://localhost:5000"
 ])
 
-MINIMUM_SCORE = 0.25
-HIGH_SCORE_THRESHOLD = 0.6  # used to adapt minimum score per-query
+MAX_BATCH_PROMPTS = int(os.environ.get("MAX_BATCH_PROMPTS", "64"))
+
+# /api/images and /descriptions page sizes
+LIST_PAGE_SIZE = int(os.environ.get("LIST_PAGE_SIZE", "100"))
+LIST_MAX_LIMIT = int(os.environ.get("LIST_MAX_LIMIT", "1000"))
+
+# Stored images are named by image id and never rewritten, and thumbnail names also carry
+# their rendering settings (see backend.thumbnails), so browsers may cache both for a long
+# time without revalidating
+IMMUTABLE_DATA_DIRS = ("images/", "thumbs/")
+DATA_CACHE_MAX_AGE = int(os.environ.get("DATA_CACHE_MAX_AGE", str(365 * 24 * 3600)))
+
+# /check_image responses keyed on (normalized query, top_k, index generation); any index
+# mutation bumps the generation, so stale entries are never served
+check_image_cache = LRUCache(
+    max_items=int(os.environ.get("CHECK_IMAGE_CACHE_SIZE", "1024")),
+    ttl=float(os.environ.get("CHECK_IMAGE_CACHE_TTL", "300")),
+)
 
 app.config["MAX_CONTENT_LENGTH"] = 20 * 1024 * 1024  # 20MB upload cap
 os.makedirs(DEFAULT_IMAGES_DIR, exist_ok=True)
 
-# Load / initialize the index & model once
-index = create_index()
+# One writer process owns the index files; readers (INDEX_ROLE=reader) open them read-only
+# and forward index-mutating requests to INDEX_WRITER_URL (see gunicorn.conf.py)
+INDEX_ROLE = os.environ.get("INDEX_ROLE", "writer")
+INDEX_WRITER_URL = os.environ.get("INDEX_WRITER_URL", "").rstrip("/")
+if INDEX_ROLE not in ("writer", "reader"):
+    raise ValueError(f"INDEX_ROLE must be writer or reader, got {INDEX_ROLE!r}")
+IS_READER = INDEX_ROLE == "reader"
+
+# Load the models in the background so the port binds right away. With PRELOAD_MODELS=1
+# (gunicorn --preload) they are loaded before fork instead and shared by the workers.
+STARTED_AT = time.perf_counter()
+WARMUP_CAPTIONER = os.environ.get("WARMUP_CAPTIONER", "0" if IS_READER else "1") != "0"
+if os.environ.get("PRELOAD_MODELS", "0") == "1":
+    preload_models(captioner=WARMUP_CAPTIONER)
+else:
+    start_warmup(captioner=WARMUP_CAPTIONER)
+
+index = None
+caption_queue = None
+
+def open_index():
+    """
+    Open the index (its dimension comes from the model config, nothing is loaded yet) and
+    start the background captioner. The writer's vector log, snapshot timer and caption
+    workers must live in one process, so under gunicorn --preload this runs in the worker
+    (post_fork in gunicorn.conf.py sets INDEX_OPEN_AFTER_FORK=1), never in the master.
+    """
+    global index, caption_queue
+    index = create_index(read_only=IS_READER)
+    # Auto captions are generated in the background unless CAPTION_ASYNC=0
+    if not IS_READER and os.environ.get("CAPTION_ASYNC", "1") != "0":
+        caption_queue = CaptionQueue(index)
+        caption_queue.recover()
+
+if os.environ.get("INDEX_OPEN_AFTER_FORK", "0") != "1":
+    open_index()
 
 init_db()
 
 
+# Routes that mutate the index; readers forward them to the writer server-side, so clients
+# only ever talk to the public address (INDEX_WRITER_URL may be a private one)
+WRITER_ENDPOINTS = {"ingest_image", "update_image"}
+INDEX_WRITER_TIMEOUT = float(os.environ.get("INDEX_WRITER_TIMEOUT", "120"))
+PROXIED_HEADERS = ("Content-Type", "Content-Length", "Accept")
+
+@app.before_request
+def route_writes_to_writer():
+    if not IS_READER or request.endpoint not in WRITER_ENDPOINTS:
+        return None
+    if not INDEX_WRITER_URL:
+        return jsonify({"error": "read-only index reader; INDEX_WRITER_URL is not set"}), 503
+    # The body is streamed through, never read into memory here
+    fwd = urllib.request.Request(
+        INDEX_WRITER_URL + request.full_path.rstrip("?"),
+        data=request.stream if request.content_length else None,
+        headers={h: request.headers[h] for h in PROXIED_HEADERS if h in request.headers},
+        method=request.method,
+    )
+    try:
+        with urllib.request.urlopen(fwd, timeout=INDEX_WRITER_TIMEOUT) as resp:
+            status, body, content_type = resp.status, resp.read(), resp.headers.get("Content-Type")
+    except urllib.error.HTTPError as e:
+        status, body, content_type = e.code, e.read(), e.headers.get("Content-Type")
+    except (urllib.error.URLError, OSError) as e:
+        return jsonify({"error": f"index writer unreachable: {e}"}), 502
+    return Response(body, status=status, content_type=content_type)
+
 @app.route("/health", methods=["GET"])
 def health():
     return jsonify({
         "status": "ok",
+        "role": INDEX_ROLE,
         "vectors": index.count(),
+        "text_cache": text_cache_stats(),
+        "text_batcher": text_batcher_stats(),
+        "check_image_cache": check_image_cache.stats(),
+        "person_cache": person_cache_stats(),
+        "index_generation": index.generation,
+        "models": model_status(),
     })
 
+@app.route("/health/live", methods=["GET"])
+def health_live():
+    """
+    Liveness: the process is up and serving, models may still be loading.
+    """
+    return jsonify({"status": "ok", "uptime_s": round(time.perf_counter() - STARTED_AT, 3)})
+
+@app.route("/health/ready", methods=["GET"])
+def health_ready():
+    """
+    Readiness: 200 once the warm-up models are loaded, 503 before (or if a load failed).
+    """
+    models = model_status()
+    required = ["clip", "captioner"] if WARMUP_CAPTIONER else ["clip"]
+    ready = all(models[name]["state"] == "ready" for name in required)
+    body = {
+        "status": "ready" if ready else "loading",
+        "models": models,
+        "uptime_s": round(time.perf_counter() - STARTED_AT, 3),
+        "vectors": index.count(),
+    }
+    return jsonify(body), 200 if ready else 503
+
+@app.route("/captions/status", methods=["GET"])
+def captions_status():
+    """
+    Backlog of the background captioner.
+    """
+    if caption_queue is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(caption_queue.status(), enabled=True))
+
 def file_path_to_url(p: str) -> str:
     """
     /var/www/mindxium/data/images/cat.jpg  ->  /data/images/cat.jpg
@@ -56,30 +194,57 @@ def file_path_to_url(p: str) -> str:
         rel = os.path.basename(p)
     return "/data/" + quote(rel.replace(os.sep, "/"))
 
-def dynamic_minimum_score(scores):
-    if not scores:
-        return MINIMUM_SCORE
-    top = max(scores)
-    factor = 0.6 if top >= HIGH_SCORE_THRESHOLD else 0.7
-    return max(MINIMUM_SCORE, top * factor)
-
-def combine_score(faiss_score: float, desc_score: float, weight_img: float = 0.8, weight_desc: float = 0.2) -> float:
-    return (faiss_score * weight_img) + (desc_score * weight_desc)
+def thumbnail_entry(path: str) -> dict:
+    """
+    Thumbnail URLs of a stored image: "thumb" (smallest), "thumbs" {size: url} and a
+    "thumb_srcset" for <img srcset>. Falls back to the original while no thumbnail exists.
+    """
+    thumbs = {size: file_path_to_url(p) for size, p in existing_thumbnails(path).items()}
+    if not thumbs:
+        original = file_path_to_url(path)
+        return {"thumb": original, "thumbs": {}, "thumb_srcset": original}
+    sizes = sorted(thumbs)
+    return {
+        "thumb": thumbs[sizes[0]],
+        "thumbs": thumbs,
+        "thumb_srcset": ", ".join(f"{thumbs[s]} {s / sizes[0]:g}x" for s in sizes),
+    }
+
+def ranked_entries(results, ranked):
+    """
+    Response entries for re-ranked hits: ranked is [(hit position, combined score), ...].
+    """
+    out = []
+    for j, combined_score in ranked:
+        ext_id, path, _, caption, user_caption, _ = results[j]
+        out.append({
+            "id": ext_id,
+            "path": file_path_to_url(path),  # <-- convert to /data/...
+            "score": combined_score,
+            "description": user_caption or caption,
+        })
+    return out
 
 @app.route("/data/<path:rel>")
 def serve_data(rel: str):
     """
     Serve files stored under DEFAULT_DATA_DIR at the /data/* URL.
     Example: /data/images/<uuid>.jpg -> <DEFAULT_DATA_DIR>/images/<uuid>.jpg
+    Responses carry ETag and Last-Modified; If-None-Match / If-Modified-Since get a 304.
+    Images and thumbnails are sent with a long, immutable Cache-Control.
     """
     base = os.path.abspath(DEFAULT_DATA_DIR)
     full = os.path.abspath(os.path.join(base, rel))
 
     # Prevent path traversal and ensure the file exists
-    if not full.startswith(base) or not os.path.isfile(full):
+    if not full.startswith(base + os.sep) or not os.path.isfile(full):
         abort(404)
 
-    return send_file(full)
+    immutable = rel.startswith(IMMUTABLE_DATA_DIRS)
+    resp = send_file(full, conditional=True, etag=True, max_age=DATA_CACHE_MAX_AGE if immutable else None)
+    if immutable:
+        resp.cache_control.immutable = True
+    return resp
 
 @app.route("/")
 def home():
@@ -132,45 +297,45 @@ def search():
 
     try:
         q = embed_text(prompt)
-        results = index.search(q, top_k=top_k)
-        out = []
-        maximum_score = None
-
-        # normalize query for text-to-text scoring
-        qnorm = q / (float((q**2).sum()) ** 0.5 + 1e-12)
-
-        for ext_id, path, score, caption, user_caption, is_active in results:
-            web_url = file_path_to_url(path)  # <-- convert to /data/...
-            if not is_active:
-                continue
-            description = user_caption or caption
-
-            # description similarity (text-to-text)
-            desc_score = 0.0
-            desc_weight = 0.2  # auto/default
-            if user_caption:
-                desc_weight = 0.35
-            if description:
-                dvec = embed_text(description)
-                dvec /= (float((dvec**2).sum()) ** 0.5 + 1e-12)
-                desc_score = float(np.dot(qnorm, dvec))
-
-            combined_score = combine_score(score, desc_score, weight_img=0.8, weight_desc=desc_weight)
-
-            entry = {"id": ext_id, "path": web_url, "score": combined_score, "description": description}
-            out.append(entry)
-            if (maximum_score is None) or combined_score > maximum_score["score"]:
-                maximum_score = entry
-
-        # apply adaptive minimum
-        min_score = dynamic_minimum_score([r["score"] for r in out])
-        out = [r for r in out if r["score"] >= min_score]
-
-        if not out:
-            if maximum_score:
-                out.append(maximum_score)
-            else:
-                return jsonify({"results": []})
+        results, caption_vecs = index.search(q, top_k=top_k, return_caption_vecs=True)
+
+        # combined image + description score, adaptive minimum; falls back to the best hit
+        out = ranked_entries(results, rerank(results, caption_vecs, q, keep_best=True))
+        return jsonify({"results": out})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/search/batch", methods=["POST"])
+def search_batch():
+    """
+    Body: { "prompts": ["a red car", "a dog on a beach"], "top_k": 5 }
+    Returns: { "results": [ { "prompt": ..., "results": [ { "id", "path", "score", "description" }, ... ] }, ... ] }
+    One entry per prompt, in request order; each list is filtered and ordered as in /search.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    prompts = data.get("prompts")
+    if not isinstance(prompts, list) or not prompts:
+        return jsonify({"error": "prompts must be a non-empty list"}), 400
+    prompts = [str(p or "").strip() for p in prompts]
+    if not all(prompts):
+        return jsonify({"error": "prompts must not be empty"}), 400
+    if len(prompts) > MAX_BATCH_PROMPTS:
+        return jsonify({"error": f"at most {MAX_BATCH_PROMPTS} prompts per request"}), 400
+    top_k = int(data.get("top_k", 5))
+    if top_k <= 0:
+        top_k = 5
+
+    try:
+        # One batched text encode (cache misses only) and one FAISS search for all prompts
+        qs = embed_texts(prompts)
+        results, caption_vecs = index.search_batch(qs, top_k=top_k)
+
+        ranked = rerank_batch(results, caption_vecs, qs, keep_best=True)
+        out = [
+            {"prompt": prompt, "results": ranked_entries(hits, r)}
+            for prompt, hits, r in zip(prompts, results, ranked)
+        ]
 
         return jsonify({"results": out})
     except Exception as e:
@@ -195,17 +360,20 @@ def ingest_image():
     try:
         user_description = (request.form.get("description") or request.form.get("caption") or "").strip()
 
-        ext_id, path, stored_description = ingest_image_file(
+        ext_id, path, stored_description, description_source, duplicate = ingest_image_file(
             index=index,
             image_file=file.stream,
             filename_hint=secure_filename(file.filename),
             user_description=user_description,
+            caption_queue=caption_queue,
         )
         return jsonify({
             "id": ext_id,
             "path": path,
             "description": stored_description,
-            "description_source": "user" if user_description else "auto",
+            "description_source": description_source,
+            "caption_pending": caption_queue is not None and not duplicate,
+            "duplicate": duplicate,
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -231,84 +399,83 @@ def check_image():
         top_k = 5
 
     try:
+        # Read the generation before searching: a result stored under it is never older than it
+        cache_key = (_normalize_prompt(query), top_k, index.generation)
+        cached = check_image_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(cached)
+
         # 1) Embed the query and search your image index
         qvec = embed_text(query)
-        results = index.search(qvec, top_k=top_k)
+        results, caption_vecs = index.search(qvec, top_k=top_k, return_caption_vecs=True)
 
         if not results:
-            return jsonify({"description": None, "descriptions": []})
-
-        matched = []
-        best_any = None
-
-        # normalized query for text-to-text scoring
-        qnorm = qvec / (float((qvec**2).sum()) ** 0.5 + 1e-12)
-
-        for ext_id, path, score, caption, user_caption, is_active in results:
-            if not is_active:
-                continue
-            web_url = file_path_to_url(path)
-            desc = user_caption or caption
-
-            desc_score = 0.0
-            desc_weight = 0.2
-            if user_caption:
-                desc_weight = 0.35
-            if desc:
-                dvec = embed_text(desc)
-                dvec /= (float((dvec**2).sum()) ** 0.5 + 1e-12)
-                desc_score = float(np.dot(qnorm, dvec))
-
-            combined_score = combine_score(score, desc_score, weight_img=0.8, weight_desc=desc_weight)
-            entry = {
-                "id": ext_id,
-                "path": web_url,
-                "score": float(combined_score),
-                "description": desc,
-            }
-            matched.append(entry)
-            if (best_any is None) or combined_score > best_any["score"]:
-                best_any = entry
-
-        if not matched and best_any:
-            matched.append(best_any)
-
-        # apply adaptive min score
-        min_score = dynamic_minimum_score([m["score"] for m in matched])
-        filtered = [m for m in matched if m["score"] >= min_score]
+            response = {"description": None, "descriptions": []}
+            check_image_cache.put(cache_key, response)
+            return jsonify(response)
+
+        # sorted by combined image+text score, filtered by the adaptive minimum
+        filtered = ranked_entries(results, rerank(results, caption_vecs, qvec))
 
         descriptions = [m["description"] for m in filtered if m.get("description")]
         top_description = descriptions[0] if descriptions else None
-        return jsonify({
+        response = {
             "description": top_description,
             "descriptions": descriptions,
-        })
+        }
+        check_image_cache.put(cache_key, response)
+        return jsonify(response)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def history_params(data):
+    """
+    (limit, since) from request args or JSON for the person history fields; (None, None)
+    keeps the full concatenated text. Raises ValueError on bad values.
+    """
+    limit = data.get("limit")
+    limit = None if limit in (None, "") else str(limit)
+    if limit is not None:
+        if not limit.isdigit():
+            raise ValueError("limit must be a non-negative integer")
+        limit = int(limit)
+    since = data.get("since") or None
+    if since is not None:
+        since = parse_since(str(since))
+        if since is None:
+            raise ValueError("since must be an ISO date or timestamp")
+    return limit, since
+
+
 @app.route("/get_info", methods=["GET", "POST"])
 def get_info():
     """
     Get person info by phone_number OR by (first_name + last_name).
     - GET:   /get_info?phone_number=...  OR  /get_info?first_name=...&last_name=...
     - POST:  JSON { "phone_number": "..."} OR {"first_name":"...","last_name":"..."}
+    Optional limit (last N entries) and/or since (ISO date or timestamp): memory_about,
+    stories_for and questions_for then come back as lists of {"text", "created_at"} holding
+    only those entries. Without either they are the full concatenated text, as before.
     Returns 404 if not found.
     """
     try:
         if request.method == "GET":
-            phone = (request.args.get("phone_number") or "").strip()
-            first_name = (request.args.get("first_name") or "").strip()
-            last_name = (request.args.get("last_name") or "").strip()
+            data = request.args
         else:
             data = request.get_json(force=True, silent=True) or {}
-            phone = (data.get("phone_number") or "").strip()
-            first_name = (data.get("first_name") or "").strip()
-            last_name = (data.get("last_name") or "").strip()
+        phone = (data.get("phone_number") or "").strip()
+        first_name = (data.get("first_name") or "").strip()
+        last_name = (data.get("last_name") or "").strip()
+
+        try:
+            limit, since = history_params(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         if phone:
-            person = get_person(phone)
+            person = get_person(phone, limit=limit, since=since)
         elif first_name and last_name:
-            person = get_person_by_name(first_name, last_name)
+            person = get_person_by_name(first_name, last_name, limit=limit, since=since)
         else:
             return jsonify({"error": "Provide phone_number OR (first_name and last_name)"}), 400
 
@@ -338,9 +505,14 @@ def set_info():
         If no existing person is found by name, returns 404 (we keep schema minimal).
       - Appendable fields (memory_about, last_conversation, stories_for, questions_for)
         are appended; first_name, last_name, relation, age are overwritten.
+      - Query params limit / since shape the returned person as for /get_info.
     """
     try:
         data = request.get_json(force=True, silent=True) or {}
+        try:
+            limit, since = history_params(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         phone = (data.get("phone_number") or "").strip()
         first_name = (data.get("first_name") or "").strip()
@@ -350,13 +522,13 @@ def set_info():
         payload = {k: v for k, v in data.items() if k != "phone_number"}
 
         if phone:
-            action, person = create_or_update_person(phone, payload)
+            action, person = create_or_update_person(phone, payload, limit=limit, since=since)
             return jsonify({"status": action, "person": person})
 
         # Fallback to name+lastname update
         if first_name and last_name:
-            # Find existing by name
-            person_lookup = get_person_by_name(first_name, last_name)
+            # Find existing by name (limit=0: only the phone number is needed)
+            person_lookup = get_person_by_name(first_name, last_name, limit=0)
             if not person_lookup:
                 return jsonify({
                     "error": "not found",
@@ -364,7 +536,7 @@ def set_info():
                 }), 404
 
             phone_target = person_lookup["phone_number"]
-            action, person = create_or_update_person(phone_target, payload)
+            action, person = create_or_update_person(phone_target, payload, limit=limit, since=since)
             return jsonify({"status": action, "person": person})
 
         return jsonify({"error": "Provide phone_number OR (first_name and last_name)"}), 400
@@ -387,30 +559,96 @@ def get_topic_when_silence():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route("/api/images", methods=["GET"])
-def list_images():
+def listing_params():
+    """
+    Query params shared by /api/images and /descriptions:
+      - cursor: faiss_rowid of the last row already seen (from next_cursor); default start
+      - limit: page size, at most LIST_MAX_LIMIT; LIST_PAGE_SIZE when only cursor is given.
+        Without cursor and limit the whole list comes back in one response, as before paging
+      - active: 1 (default), 0 or all; include_inactive=1 is the older spelling of all
+      - source: user | auto | none, to filter on where the description comes from
+      - stream=1 (or Accept: application/x-ndjson): every matching row as NDJSON, no paging
+    Raises ValueError on bad values.
+    """
+    args = request.args
+    active = args.get("active")
+    if active is None:
+        active = "all" if args.get("include_inactive", "0") not in ("0", "") else "1"
+    if active not in ("1", "0", "all"):
+        raise ValueError("active must be 1, 0 or all")
+    source = args.get("source") or None
+    if source is not None and source not in DESCRIPTION_SOURCES:
+        raise ValueError(f"source must be one of {', '.join(sorted(DESCRIPTION_SOURCES))}")
+    paged = "cursor" in args or "limit" in args
+    limit = int(args.get("limit", LIST_PAGE_SIZE))
+    if not 1 <= limit <= LIST_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {LIST_MAX_LIMIT}")
+    stream = args.get("stream") == "1" or request.accept_mimetypes.best == "application/x-ndjson"
+    return {
+        "after": int(args.get("cursor") or 0),
+        "limit": limit if paged else None,
+        "active": None if active == "all" else active == "1",
+        "source": source,
+        "stream": stream,
+    }
+
+def listing_response(key: str, to_entry):
+    """
+    One keyset page as {key: [...], "next_cursor": ...} (null on the last page), or with
+    stream=1 every matching row as one JSON object per line, read page by page from SQLite.
+    Without cursor and limit, every matching row in one {key: [...], "next_cursor": null}.
+    """
     try:
-        include_inactive = bool(int(request.args.get("include_inactive", "0")))
-        rows = index.list_all(include_inactive=include_inactive)
-        out = []
-        for ext_id, path, caption, user_caption, is_active in rows:
-            out.append({
-                "id": ext_id,
-                "path": file_path_to_url(path),
-                "caption": caption,
-                "user_caption": user_caption,
-                "description": user_caption or caption,
-                "is_active": bool(is_active),
-            })
-        return jsonify({"images": out})
+        params = listing_params()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        if params["stream"]:
+            rows = index.iter_rows(after=params["after"], active=params["active"], source=params["source"])
+            lines = (json.dumps(to_entry(row)) + "\n" for row in rows)
+            return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+
+        if params["limit"] is None:
+            rows = index.iter_rows(after=params["after"], active=params["active"], source=params["source"])
+            return jsonify({key: [to_entry(row) for row in rows], "next_cursor": None})
+
+        # One extra row tells whether another page follows
+        rows = index.list_page(
+            after=params["after"], limit=params["limit"] + 1, active=params["active"], source=params["source"],
+        )
+        more = len(rows) > params["limit"]
+        rows = rows[:params["limit"]]
+        return jsonify({
+            key: [to_entry(row) for row in rows],
+            "next_cursor": rows[-1][0] if more else None,
+        })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def image_entry(row) -> dict:
+    _, ext_id, path, caption, user_caption, is_active = row
+    return dict({
+        "id": ext_id,
+        "path": file_path_to_url(path),
+        "caption": caption,
+        "user_caption": user_caption,
+        "description": user_caption or caption,
+        "is_active": bool(is_active),
+    }, **thumbnail_entry(path))
+
+@app.route("/api/images", methods=["GET"])
+def list_images():
+    """
+    GET /api/images?cursor=&limit=&active=&source=&stream=
+    Image listing, keyset-paginated when cursor or limit is given; see listing_params.
+    """
+    return listing_response("images", image_entry)
+
 @app.route("/api/images/<ext_id>", methods=["PATCH", "DELETE"])
 def update_image(ext_id):
     try:
         if request.method == "DELETE":
-            index.set_active(ext_id, 0)
+            index.remove(ext_id)
             # best-effort delete file
             row = index.get_by_ext_id(ext_id)
             if row and row[1]:
@@ -418,6 +656,7 @@ def update_image(ext_id):
                     os.remove(row[1])
                 except Exception:
                     pass
+                remove_thumbnails(row[1])
             return jsonify({"status": "deleted"})
 
         data = request.get_json(force=True, silent=True) or {}
@@ -431,23 +670,12 @@ def update_image(ext_id):
 def list_descriptions():
     """
     GET /descriptions
-    Returns all image IDs, paths and their effective description (user_caption or caption).
-    Optional query param: include_inactive=1 to also include inactive images.
+    Returns the effective description (user_caption or caption) of stored images: all of
+    them, or one keyset page when cursor or limit is given. Takes the same cursor / limit /
+    active / source / stream params as /api/images; include_inactive=1 still includes
+    inactive images.
     """
-    try:
-        include_inactive = bool(int(request.args.get("include_inactive", "0")))
-        rows = index.list_all(include_inactive=include_inactive)
-        out = []
-        for ext_id, path, caption, user_caption, is_active in rows:
-            out.append({
-                # "id": ext_id,
-                # "path": file_path_to_url(path),
-                "description": user_caption or caption,
-                # "is_active": bool(is_active),
-            })
-        return jsonify({"descriptions": out})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return listing_response("descriptions", lambda row: {"description": row[4] or row[3]})
 
 
 if __name__ == "__main__":
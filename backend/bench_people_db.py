@@ -0,0 +1,116 @@
+"""
+Load test for people.db: mixed get/set traffic from concurrent threads. Modes: legacy
+connect-per-call, pooled WAL connections, and pooled plus the in-process profile cache.
+
+    python -m backend.bench_people_db [--threads 8] [--ops 2000] [--people 1000] [--writes 0.2]
+
+Each mode runs in a fresh process against its own temporary database seeded with the same
+people. Reports p50/p99 latency of reads (get_person / get_person_by_name) and writes
+(create_or_update_person) and the total throughput.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def _person(i: int) -> Dict[str, str]:
+    return {"phone": f"+1555{i:07d}", "first_name": f"First{i}", "last_name": f"Last{i}"}
+
+
+def _child(mode: str, db_path: str, args) -> None:
+    os.environ["PEOPLE_DB_POOL"] = "0" if mode == "legacy" else "1"
+    os.environ["PEOPLE_CACHE_SIZE"] = os.environ.get("PEOPLE_CACHE_SIZE", "4096") if mode == "cached" else "0"
+    from backend import people_db
+
+    people_db.DB_PATH = db_path
+    people_db.init_db()
+    for i in range(args.people):
+        p = _person(i)
+        people_db.create_or_update_person(p["phone"], {
+            "first_name": p["first_name"], "last_name": p["last_name"], "memory_about": "likes tea",
+        })
+
+    reads, writes = [], []
+    lock = threading.Lock()
+
+    def worker(seed: int) -> None:
+        rng = random.Random(seed)
+        r, w = [], []
+        for _ in range(args.ops):
+            p = _person(rng.randrange(args.people))
+            t0 = time.perf_counter()
+            if rng.random() < args.writes:
+                people_db.create_or_update_person(p["phone"], {"stories_for": "told a story"})
+                w.append(time.perf_counter() - t0)
+            elif rng.random() < 0.5:
+                people_db.get_person(p["phone"])
+                r.append(time.perf_counter() - t0)
+            else:
+                people_db.get_person_by_name(p["first_name"], p["last_name"])
+                r.append(time.perf_counter() - t0)
+        with lock:
+            reads.extend(r)
+            writes.extend(w)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({"reads": reads, "writes": writes, "elapsed": elapsed}))
+
+
+def _ms(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) * 1000.0 if values else float("nan")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="people.db latency under mixed get/set load")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=2000, help="operations per thread")
+    parser.add_argument("--people", type=int, default=1000)
+    parser.add_argument("--writes", type=float, default=0.2, help="fraction of operations that are writes")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "DB"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(args.child[0], args.child[1], args)
+        return
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        print(f"{args.threads} threads x {args.ops} ops, {args.people} people, {args.writes:.0%} writes")
+        print(f"{'mode':<8}{'read p50':>10}{'read p99':>10}{'write p50':>11}{'write p99':>11}{'ops/sec':>10}")
+        for mode in ("legacy", "pooled", "cached"):
+            db_path = os.path.join(tmpdir, f"{mode}.db")
+            cmd = [
+                sys.executable, "-m", "backend.bench_people_db", "--child", mode, db_path,
+                "--threads", str(args.threads), "--ops", str(args.ops),
+                "--people", str(args.people), "--writes", str(args.writes),
+            ]
+            out = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            res = json.loads(out.stdout.strip().splitlines()[-1])
+            total = len(res["reads"]) + len(res["writes"])
+            print(
+                f"{mode:<8}{_ms(res['reads'], 50):>8.2f}ms{_ms(res['reads'], 99):>8.2f}ms"
+                f"{_ms(res['writes'], 50):>9.2f}ms{_ms(res['writes'], 99):>9.2f}ms"
+                f"{total / res['elapsed']:>10.0f}"
+            )
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Micro-benchmark: vectorized re-ranking (backend.rerank) vs the per-hit Python loops
+/search and /check_image used before.
+
+    python -m backend.bench_rerank [--dim 512] [--repeat 200]
+
+Hits are synthetic (random scores, normalized caption vectors, a third with user
+captions); no model or index is loaded.
+"""
+import argparse
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from backend.rerank import HIGH_SCORE_THRESHOLD, MINIMUM_SCORE, rerank
+
+
+def _dynamic_minimum_score(scores):
+    if not scores:
+        return MINIMUM_SCORE
+    top = max(scores)
+    factor = 0.6 if top >= HIGH_SCORE_THRESHOLD else 0.7
+    return max(MINIMUM_SCORE, top * factor)
+
+
+def _combine_score(faiss_score: float, desc_score: float, weight_img: float = 0.8, weight_desc: float = 0.2) -> float:
+    return (faiss_score * weight_img) + (desc_score * weight_desc)
+
+
+def loop_rerank(results, caption_vecs, q):
+    """
+    The loop from the old /search route (minus URL building).
+    """
+    out = []
+    maximum_score = None
+    qnorm = q / (float((q**2).sum()) ** 0.5 + 1e-12)
+    desc_scores = caption_vecs @ qnorm.astype(np.float32)
+    for (ext_id, path, score, caption, user_caption, is_active), desc_score in zip(results, desc_scores):
+        if not is_active:
+            continue
+        description = user_caption or caption
+        desc_weight = 0.2
+        if user_caption:
+            desc_weight = 0.35
+        desc_score = float(desc_score) if description else 0.0
+        combined_score = _combine_score(score, desc_score, weight_img=0.8, weight_desc=desc_weight)
+        entry = {"id": ext_id, "score": combined_score, "description": description}
+        out.append(entry)
+        if (maximum_score is None) or combined_score > maximum_score["score"]:
+            maximum_score = entry
+    min_score = _dynamic_minimum_score([r["score"] for r in out])
+    out = [r for r in out if r["score"] >= min_score]
+    if not out and maximum_score:
+        out.append(maximum_score)
+    return out
+
+
+def _synthetic_hits(top_k: int, dim: int, rng: np.random.Generator):
+    scores = np.sort(rng.uniform(0.1, 0.5, size=top_k))[::-1]
+    caption_vecs = rng.normal(size=(top_k, dim)).astype(np.float32)
+    caption_vecs /= np.linalg.norm(caption_vecs, axis=1, keepdims=True)
+    results = []
+    for j in range(top_k):
+        user_caption = f"user caption {j}" if j % 3 == 0 else None
+        results.append((f"id{j}", f"/data/images/{j}.jpg", float(scores[j]), f"caption {j}", user_caption, 1))
+    q = rng.normal(size=dim).astype(np.float32)
+    return results, caption_vecs, q
+
+
+def _time(fn, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark re-ranking implementations")
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--top-k", type=lambda s: [int(x) for x in s.split(",")], default=[5, 50, 500])
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    print(f"{'top_k':>6}{'loop us':>12}{'vector us':>12}{'speedup':>10}")
+    for top_k in args.top_k:
+        results, caption_vecs, q = _synthetic_hits(top_k, args.dim, rng)
+
+        # Same hits survive, in combined-score order
+        expected = sorted(loop_rerank(results, caption_vecs, q), key=lambda r: -r["score"])
+        got = rerank(results, caption_vecs, q, keep_best=True)
+        assert [r["id"] for r in expected] == [results[j][0] for j, _ in got]
+
+        loop_us = _time(lambda: loop_rerank(results, caption_vecs, q), args.repeat)
+        vec_us = _time(lambda: rerank(results, caption_vecs, q, keep_best=True), args.repeat)
+        print(f"{top_k:>6}{loop_us:>12.1f}{vec_us:>12.1f}{loop_us / vec_us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Measure cold start of the API server.
+
+    python -m backend.bench_startup [--port 5055] [--timeout 600]
+
+Starts `python app.py` in a subprocess and polls /health/live and /health/ready. Reports the
+time until the port answers, the time until the models are ready, and the per-model load
+timings from /health/ready.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _get(url: str) -> Tuple[Optional[int], Optional[dict]]:
+    try:
+        with urllib.request.urlopen(url, timeout=2) as resp:
+            return resp.status, json.loads(resp.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read().decode("utf-8") or "null")
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return None, None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure API cold-start time")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--interval", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    base = f"http://127.0.0.1:{args.port}"
+    env = dict(os.environ, PORT=str(args.port))
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "app.py"], cwd=ROOT, env=env)
+    live_s = ready_s = None
+    body = None
+    try:
+        while time.perf_counter() - t0 < args.timeout:
+            if proc.poll() is not None:
+                print(f"server exited with code {proc.returncode}")
+                return
+            if live_s is None:
+                status, _ = _get(base + "/health/live")
+                if status == 200:
+                    live_s = time.perf_counter() - t0
+            else:
+                status, body = _get(base + "/health/ready")
+                if status == 200:
+                    ready_s = time.perf_counter() - t0
+                    break
+                if body and any(m["state"] == "failed" for m in body.get("models", {}).values()):
+                    break
+            time.sleep(args.interval)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    print(f"live:  {live_s:.2f}s" if live_s is not None else "live:  timed out")
+    print(f"ready: {ready_s:.2f}s" if ready_s is not None else "ready: not reached")
+    for name, m in (body or {}).get("models", {}).items():
+        seconds = f"{m['seconds']:.2f}s" if m.get("seconds") is not None else "-"
+        print(f"  {name:<10} {m['state']:<8} {seconds}" + (f"  ({m['error']})" if m.get("error") else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Peak RSS of handling one upload: the old buffered path vs the streamed, decode-once path.
+
+    python -m backend.bench_upload [--width 6000 --height 4000] [--formats jpg,png]
+
+Each measurement runs in a fresh process. The peak RSS counter is reset right before the
+upload is handled (Linux /proc/self/clear_refs), so import cost is not counted. Only the
+save, decode and resize-to-224 steps are measured; the models are not loaded.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+
+
+def _rss_kb(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _reset_peak() -> None:
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+
+def _buffered(src: str, dst: str) -> None:
+    # Previous ingest_image_file: whole upload in memory, file decoded twice at full size
+    with open(src, "rb") as upload, open(dst, "wb") as f:
+        f.write(upload.read())
+    for _ in range(2):
+        img = Image.open(dst).convert("RGB")
+        img.resize((224, 224))
+
+
+def _streamed(src: str, dst: str) -> None:
+    from backend.embedding import load_rgb, save_upload
+
+    with open(src, "rb") as upload:
+        save_upload(upload, dst)
+    img = load_rgb(dst)
+    img.resize((224, 224))
+
+
+def _child(mode: str, src: str) -> None:
+    if mode == "streamed":
+        import backend.embedding  # noqa: F401  (imports are not part of the measurement)
+    dst = tempfile.mktemp(suffix=os.path.splitext(src)[1])
+    base = _rss_kb("VmRSS")
+    _reset_peak()
+    (_streamed if mode == "streamed" else _buffered)(src, dst)
+    print(_rss_kb("VmHWM") - base)
+    os.remove(dst)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Peak RSS per upload")
+    parser.add_argument("--width", type=int, default=6000)
+    parser.add_argument("--height", type=int, default=4000)
+    parser.add_argument("--formats", type=lambda s: s.split(","), default=["jpg", "png"])
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(*args.child)
+        return
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        rng = np.random.default_rng(0)
+        # Smooth gradients plus noise: compresses like a photo, not like pure noise
+        y, x = np.mgrid[0:args.height, 0:args.width]
+        base = np.stack([x % 256, y % 256, (x + y) % 256], axis=-1).astype(np.int16)
+        pixels = np.clip(base + rng.integers(-20, 20, size=base.shape), 0, 255).astype(np.uint8)
+        print(f"{args.width}x{args.height} image")
+        print(f"{'format':<8}{'file MB':>9}{'buffered MB':>13}{'streamed MB':>13}")
+        for fmt in args.formats:
+            src = os.path.join(tmpdir, f"upload.{fmt}")
+            Image.fromarray(pixels).save(src, quality=90) if fmt == "jpg" else Image.fromarray(pixels).save(src)
+            peaks = {}
+            for mode in ("buffered", "streamed"):
+                out = subprocess.run(
+                    [sys.executable, "-m", "backend.bench_upload", "--child", mode, src],
+                    capture_output=True, text=True, check=True,
+                )
+                peaks[mode] = int(out.stdout.strip().splitlines()[-1]) / 1024.0
+            size_mb = os.path.getsize(src) / (1024.0 * 1024.0)
+            print(f"{fmt:<8}{size_mb:>9.1f}{peaks['buffered']:>13.1f}{peaks['streamed']:>13.1f}")
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
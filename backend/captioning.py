@@ -0,0 +1,167 @@
+import os
+import queue
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from backend.embedding import (
+    blend_with_captions,
+    embed_image_pil,
+    generate_captions,
+    load_rgb,
+)
+from backend.faiss_index import ImageVectorIndex
+
+CAPTION_WORKERS = int(os.environ.get("CAPTION_WORKERS", "1"))
+CAPTION_BATCH_SIZE = int(os.environ.get("CAPTION_BATCH_SIZE", "8"))
+CAPTION_BATCH_WAIT_MS = float(os.environ.get("CAPTION_BATCH_WAIT_MS", "200"))
+
+
+class _CaptionJob:
+    __slots__ = ("ext_id", "path", "image_vec", "queued_at")
+
+    def __init__(self, ext_id: str, path: str, image_vec: Optional[np.ndarray]):
+        self.ext_id = ext_id
+        self.path = path
+        self.image_vec = image_vec
+        self.queued_at = time.perf_counter()
+
+
+class CaptionQueue:
+    """
+    Background captioning for ingested images.
+    Workers pull pending images in batches, caption them with one ViT-GPT2 generate call,
+    then store the caption and re-blend the image vector with it.
+    """
+    def __init__(
+        self,
+        index: ImageVectorIndex,
+        workers: int = CAPTION_WORKERS,
+        batch_size: int = CAPTION_BATCH_SIZE,
+        batch_wait_ms: float = CAPTION_BATCH_WAIT_MS,
+    ):
+        self.index = index
+        self.batch_size = max(1, int(batch_size))
+        self.batch_wait = max(0.0, batch_wait_ms) / 1000.0
+        self._queue: "queue.Queue[_CaptionJob]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.in_flight = 0
+        self.done = 0
+        self.failed = 0
+        self.batches = 0
+        self.total_latency = 0.0
+        self.workers = max(1, int(workers))
+        self._threads = []
+        # Create the queue in the process that serves the writer index: its workers write to
+        # it and are not restarted after fork (gunicorn opens both in post_fork)
+        self._start_workers()
+
+    def _start_workers(self):
+        self._threads = []
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"captioner-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(
+        self,
+        ext_id: str,
+        path: str,
+        image_vec: Optional[np.ndarray] = None,
+    ) -> None:
+        self._queue.put(_CaptionJob(ext_id, path, image_vec))
+
+    def recover(self) -> int:
+        """
+        Re-queue rows left pending by a previous process. Returns how many were queued.
+        """
+        pending = self.index.list_pending_captions()
+        for ext_id, path, _ in pending:
+            self.submit(ext_id, path)
+        return len(pending)
+
+    def _collect(self) -> List[_CaptionJob]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            with self._stats_lock:
+                self.in_flight += len(batch)
+            try:
+                self._process(batch)
+            finally:
+                with self._stats_lock:
+                    self.in_flight -= len(batch)
+
+    def _process(self, batch: List[_CaptionJob]):
+        jobs, images = [], []
+        for job in batch:
+            try:
+                images.append(load_rgb(job.path))
+                jobs.append(job)
+            except Exception as e:
+                print(f"captioning: cannot open {job.path}: {e}")
+                self.index.set_caption(job.ext_id, None, status="failed")
+                with self._stats_lock:
+                    self.failed += 1
+        if not jobs:
+            return
+
+        try:
+            captions = generate_captions(images, max_new_tokens=80, max_words=60)
+        except Exception as e:
+            print(f"captioning: batch of {len(jobs)} failed: {e}")
+            for job in jobs:
+                self.index.set_caption(job.ext_id, None, status="failed")
+            with self._stats_lock:
+                self.failed += len(jobs)
+            return
+
+        for job, img, caption in zip(jobs, images, captions):
+            try:
+                image_vec = job.image_vec
+                if image_vec is None:
+                    image_vec = embed_image_pil(img).astype(np.float32)
+                # Blended with the user caption current when the row is written, not the one
+                # at submit time: it may have been edited meanwhile
+                self.index.set_caption(
+                    job.ext_id, caption,
+                    blend=lambda c, u, v=image_vec: blend_with_captions(v, c, u),
+                )
+                with self._stats_lock:
+                    self.done += 1
+                    self.total_latency += time.perf_counter() - job.queued_at
+            except Exception as e:
+                print(f"captioning: storing caption for {job.ext_id} failed: {e}")
+                with self._stats_lock:
+                    self.failed += 1
+        with self._stats_lock:
+            self.batches += 1
+
+    def status(self) -> dict:
+        with self._stats_lock:
+            return {
+                "backlog": self._queue.qsize(),
+                "in_flight": self.in_flight,
+                "done": self.done,
+                "failed": self.failed,
+                "batches": self.batches,
+                "avg_batch_size": (self.done / self.batches) if self.batches else 0.0,
+                "avg_latency_s": (self.total_latency / self.done) if self.done else 0.0,
+                "workers": len(self._threads),
+                "batch_size": self.batch_size,
+            }
@@ -0,0 +1,132 @@
+"""
+Duplicate detection for stored images.
+
+Ingest looks up the sha256 of each upload (and, with DEDUP_PHASH=1, a 64-bit dHash of the
+decoded image) in meta.db; a match returns the existing image without running any model.
+
+    python -m backend.dedup backfill                 # hash rows stored before hashing existed
+    python -m backend.dedup report [--threshold 0.97] [--k 5]
+
+report lists exact duplicates (same sha256) and near duplicates: pairs of active images whose
+stored vectors have inner product >= threshold, found with the FAISS index itself.
+"""
+import argparse
+import hashlib
+import os
+from typing import List, Optional, Tuple
+
+import faiss
+import numpy as np
+from PIL import Image
+
+from backend.faiss_index import DEFAULT_INDEX_PATH, DEFAULT_META_DB, ImageVectorIndex
+
+DEDUP_PHASH = os.environ.get("DEDUP_PHASH", "0") == "1"
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def dhash(img: Image.Image, size: int = 8) -> str:
+    """
+    Difference hash: compares neighbouring pixels of a (size+1) x size grayscale thumbnail.
+    Light re-encodes often keep the same hash; ingest only looks up exact matches (Hamming
+    distance 0). Returned as 16 hex digits.
+    """
+    small = np.asarray(img.convert("L").resize((size + 1, size), Image.BILINEAR), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return f"{int(''.join('1' if b else '0' for b in bits), 2):0{size * size // 4}x}"
+
+
+def _open_index(args) -> ImageVectorIndex:
+    dim = faiss.read_index(args.index_path).d
+    return ImageVectorIndex(dim=dim, index_path=args.index_path, meta_db_path=args.meta_db, snapshot_interval=0)
+
+
+def cmd_backfill(args) -> None:
+    index = _open_index(args)
+    rows = index.conn.execute(
+        "SELECT ext_id, path FROM images WHERE content_hash IS NULL OR (? AND phash IS NULL)",
+        (1 if args.phash else 0,),
+    ).fetchall()
+    done = 0
+    for ext_id, path in rows:
+        if not os.path.isfile(path):
+            continue
+        ph = None
+        if args.phash:
+            from backend.embedding import load_rgb
+
+            try:
+                ph = dhash(load_rgb(path))
+            except Exception as e:
+                print(f"cannot decode {path}: {e}")
+        index.set_hashes(ext_id, sha256_file(path), ph)
+        done += 1
+    print(f"hashed {done} of {len(rows)} rows")
+    index.close()
+
+
+def near_duplicates(index: ImageVectorIndex, threshold: float, k: int) -> List[Tuple[int, int, float]]:
+    """
+    (id_a, id_b, score) for active pairs with score >= threshold, each pair once (id_a < id_b).
+    """
+    ids, vectors = index.reconstruct_all()
+    active = index.meta.active_mask(int(ids.max()) + 1 if ids.size else 0)
+    keep = active[ids] if ids.size else np.zeros(0, dtype=bool)
+    ids, vectors = ids[keep], vectors[keep]
+    pairs = []
+    # k + 1: the query vector itself is its own best hit
+    for start in range(0, ids.size, 1024):
+        q = vectors[start:start + 1024]
+        results, _ = index.search_batch(q, top_k=k + 1)
+        for qid, hits in zip(ids[start:start + 1024].tolist(), results):
+            for ext_id, _, score, _, _, _ in hits:
+                other = index.meta.lookup(ext_id)
+                if other is not None and other > qid and score >= threshold:
+                    pairs.append((qid, other, score))
+    pairs.sort(key=lambda p: -p[2])
+    return pairs
+
+
+def cmd_report(args) -> None:
+    index = _open_index(args)
+    groups = index.conn.execute(
+        "SELECT content_hash, GROUP_CONCAT(ext_id, ' ') FROM images "
+        "WHERE content_hash IS NOT NULL AND is_active = 1 "
+        "GROUP BY content_hash HAVING COUNT(*) > 1"
+    ).fetchall()
+    print(f"exact duplicates (same sha256): {len(groups)} groups")
+    for content_hash, ext_ids in groups:
+        print(f"  {content_hash[:12]}  {ext_ids}")
+
+    pairs = near_duplicates(index, args.threshold, args.k)
+    print(f"near duplicates (vector score >= {args.threshold}): {len(pairs)} pairs")
+    for a, b, score in pairs:
+        print(f"  {score:.4f}  {index.meta.ext_ids[a]} {index.meta.paths[a]}")
+        print(f"  {'':6}  {index.meta.ext_ids[b]} {index.meta.paths[b]}")
+    index.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Duplicate image detection")
+    parser.add_argument("--index-path", default=DEFAULT_INDEX_PATH)
+    parser.add_argument("--meta-db", default=DEFAULT_META_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("backfill", help="compute hashes for rows that have none")
+    p.add_argument("--phash", action="store_true", default=DEDUP_PHASH, help="also compute dHash")
+    p = sub.add_parser("report", help="list exact and near-duplicate images")
+    p.add_argument("--threshold", type=float, default=0.97)
+    p.add_argument("--k", type=int, default=5)
+    args = parser.parse_args(argv)
+    {"backfill": cmd_backfill, "report": cmd_report}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,12 @@
+import hashlib
 import os
+import queue
+import threading
+import time
 import uuid
+from concurrent.futures import Future
 from typing import List, Tuple, Iterable, Optional
+import faiss
 import torch
 from PIL import Image
 import numpy as np
@@ -9,7 +15,11 @@ from transformers import VisionEncoderDecoderModel, ViTImageProcessor, AutoToken
 # open-clip-torch is a lightweight CLIP-like local model
 import open_clip
 
-from backend.faiss_index import ImageVectorIndex, DEFAULT_IMAGES_DIR
+from backend.faiss_index import ImageVectorIndex, DEFAULT_IMAGES_DIR, DEFAULT_INDEX_PATH
+from backend.inference import INFERENCE_BACKEND, prepare_captioner, prepare_clip
+from backend.dedup import DEDUP_PHASH, dhash
+from backend.thumbnails import save_thumbnails
+from backend.lru_cache import LRUCache
 
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 print(DEVICE)
@@ -20,11 +30,50 @@ _model = None
 _preprocess = None
 _tokenizer = None
 _embed_dim = None
+_model_key = None
+# Serializes model loading between the warm-up thread and request threads
+_clip_lock = threading.Lock()
+_captioner_lock = threading.Lock()
+
+# Per-model load state for /health/ready: {"state": pending|loading|ready|failed, "seconds", "error"}
+_load_status = {
+    "clip": {"state": "pending", "seconds": None, "error": None},
+    "captioner": {"state": "pending", "seconds": None, "error": None},
+}
+
+# Text embeddings are cached per normalized prompt; clients repeat the same prompts a lot.
+TEXT_CACHE_SIZE = int(os.environ.get("TEXT_EMBED_CACHE_SIZE", "4096"))
+TEXT_CACHE_MB = float(os.environ.get("TEXT_EMBED_CACHE_MB", "32"))
+_text_cache = LRUCache(
+    max_items=TEXT_CACHE_SIZE,
+    max_bytes=int(TEXT_CACHE_MB * 1024 * 1024),
+    sizeof=lambda v: v.nbytes,
+)
+_text_cache_key = None
+
+# Concurrent embed_text calls are coalesced into one batch by a background worker.
+TEXT_BATCHING = os.environ.get("TEXT_BATCHING", "1") != "0"
+TEXT_BATCH_WINDOW_MS = float(os.environ.get("TEXT_BATCH_WINDOW_MS", "5"))
+TEXT_BATCH_MAX = int(os.environ.get("TEXT_BATCH_MAX", "32"))
 
 _VITGPT2_MODEL = None
 _VITGPT2_EXTRACTOR = None
 _VITGPT2_TOKENIZER = None
 
+# Intra-op threads per process (torch and FAISS OpenMP); 0 keeps the library defaults.
+# Several server processes on one host should split the cores between them.
+TORCH_THREADS = int(os.environ.get("TORCH_THREADS", "0"))
+
+
+def set_thread_budget(threads: int) -> None:
+    if threads <= 0:
+        return
+    torch.set_num_threads(threads)
+    faiss.omp_set_num_threads(threads)
+
+
+set_thread_budget(TORCH_THREADS)
+
 
 def _blend_image_text_vectors(
     image_vec: np.ndarray,
@@ -40,9 +89,10 @@ def _blend_image_text_vectors(
     parts = [(txt, w) for (txt, w) in (text_parts or []) if txt and w > 0]
     if parts:
         total = sum(w for _, w in parts)
-        for prompt, w in parts:
+        text_vecs = embed_texts([prompt for prompt, _ in parts])
+        for (_, w), text_vec in zip(parts, text_vecs):
             weight = w / total * (1.0 - image_weight)
-            vecs.append(embed_text(prompt).astype(np.float32))
+            vecs.append(text_vec)
             weights.append(weight)
 
     weights_arr = np.array(weights, dtype=np.float32)
@@ -52,45 +102,306 @@ def _blend_image_text_vectors(
     return blended_vec
 
 
+def blend_with_captions(
+    image_vec: np.ndarray,
+    auto_caption: Optional[str],
+    user_caption: Optional[str],
+) -> np.ndarray:
+    """
+    The stored vector for an image: image embedding blended with its captions.
+    """
+    text_parts: List[Tuple[str, float]] = []
+    # auto caption weight 0.2, user caption weight 0.35 (later normalized to 1 - image_weight)
+    if auto_caption:
+        text_parts.append((auto_caption, 0.20))
+    if user_caption:
+        text_parts.append((user_caption, 0.35))
+    return _blend_image_text_vectors(
+        image_vec,
+        text_parts,
+        image_weight=0.8,
+    )
+
+
+def _clip_model_key() -> Tuple[str, str]:
+    return MODEL_NAME, MODEL_PRETRAINED
+
+
+def embed_dim() -> int:
+    """
+    CLIP embedding size without loading the model: the loaded model's value if any, else the
+    open_clip model config, else the dimension of the index already on disk.
+    """
+    if _embed_dim is not None and _model_key == _clip_model_key():
+        return _embed_dim
+    cfg = open_clip.get_model_config(MODEL_NAME)
+    if cfg and cfg.get("embed_dim"):
+        return int(cfg["embed_dim"])
+    if os.path.exists(DEFAULT_INDEX_PATH):
+        return int(faiss.read_index(DEFAULT_INDEX_PATH).d)
+    return get_model()[3]
+
+
+def _timed_load(name: str, loader):
+    status = _load_status[name]
+    status.update(state="loading", error=None)
+    t0 = time.perf_counter()
+    try:
+        result = loader()
+    except Exception as e:
+        status.update(state="failed", error=str(e))
+        raise
+    status.update(state="ready", seconds=round(time.perf_counter() - t0, 3))
+    return result
+
+
+def _create_clip():
+    """
+    Load the fp32 open_clip model: (model, preprocess, tokenizer).
+    """
+    model, _, preprocess = open_clip.create_model_and_transforms(
+        MODEL_NAME, pretrained=MODEL_PRETRAINED, device=DEVICE
+    )
+    model.eval()
+    return model, preprocess, open_clip.get_tokenizer(MODEL_NAME)
+
+
+def _create_captioner():
+    """
+    Load the fp32 ViT-GPT2 captioner: (model, extractor, tokenizer).
+    """
+    model_name = "nlpconnect/vit-gpt2-image-captioning"
+    model = VisionEncoderDecoderModel.from_pretrained(model_name).to(DEVICE)
+    model.eval()
+    return model, ViTImageProcessor.from_pretrained(model_name), AutoTokenizer.from_pretrained(model_name)
+
+
 def get_model():
-    global _model, _preprocess, _tokenizer, _embed_dim
-    if _model is None:
-        model, _, preprocess = open_clip.create_model_and_transforms(
-            MODEL_NAME, pretrained=MODEL_PRETRAINED, device=DEVICE
-        )
-        tokenizer = open_clip.get_tokenizer(MODEL_NAME)
-        model.eval()
-        _model = model
-        _preprocess = preprocess
-        _tokenizer = tokenizer
-        # infer embed dim
-        with torch.no_grad():
-            dummy = torch.randn(1, 3, 224, 224, device=DEVICE)
-            feat = model.encode_image(dummy)
-            _embed_dim = int(feat.shape[-1])
+    global _model, _preprocess, _tokenizer, _embed_dim, _model_key
+    if _model is not None and _model_key == _clip_model_key():
+        return _model, _preprocess, _tokenizer, _embed_dim
+    with _clip_lock:
+        if _model is None or _model_key != _clip_model_key():
+            model, preprocess, tokenizer = _timed_load("clip", _create_clip)
+            _preprocess = preprocess
+            _tokenizer = tokenizer
+            # embed dim from the projection, no dummy forward pass
+            _embed_dim = int(getattr(model.visual, "output_dim", 0) or model.text_projection.shape[1])
+            # fp32 torch, INT8-quantized torch or ONNX Runtime (INFERENCE_BACKEND)
+            _model = prepare_clip(model, MODEL_NAME, MODEL_PRETRAINED, INFERENCE_BACKEND)
+            _model_key = _clip_model_key()
     return _model, _preprocess, _tokenizer, _embed_dim
 
 def _load_vitgpt2_captioner():
     global _VITGPT2_MODEL, _VITGPT2_EXTRACTOR, _VITGPT2_TOKENIZER
-    if _VITGPT2_MODEL is None:
-        model_name = "nlpconnect/vit-gpt2-image-captioning"
-        _VITGPT2_MODEL = VisionEncoderDecoderModel.from_pretrained(model_name).to(DEVICE)
-        _VITGPT2_MODEL.eval()
-        _VITGPT2_EXTRACTOR = ViTImageProcessor.from_pretrained(model_name)
-        _VITGPT2_TOKENIZER = AutoTokenizer.from_pretrained(model_name)
+    if _VITGPT2_MODEL is not None:
+        return _VITGPT2_MODEL, _VITGPT2_EXTRACTOR, _VITGPT2_TOKENIZER
+    with _captioner_lock:
+        if _VITGPT2_MODEL is None:
+            model, extractor, tokenizer = _timed_load("captioner", _create_captioner)
+            _VITGPT2_EXTRACTOR = extractor
+            _VITGPT2_TOKENIZER = tokenizer
+            _VITGPT2_MODEL = prepare_captioner(model, INFERENCE_BACKEND)
     return _VITGPT2_MODEL, _VITGPT2_EXTRACTOR, _VITGPT2_TOKENIZER
 
+
+def start_warmup(captioner: bool = True) -> threading.Thread:
+    """
+    Load CLIP (then the captioner) in a background thread so the server can start serving
+    right away. Requests that need a model before it is ready wait for it.
+    """
+    def run():
+        for name, loader in (("clip", get_model), ("captioner", _load_vitgpt2_captioner)):
+            if name == "captioner" and not captioner:
+                continue
+            try:
+                loader()
+            except Exception as e:
+                print(f"warm-up: loading {name} failed: {e}")
+
+    t = threading.Thread(target=run, name="model-warmup", daemon=True)
+    t.start()
+    return t
+
+
+def preload_models(captioner: bool = True) -> None:
+    """
+    Load the models synchronously. A pre-forking server calls this before fork so the
+    workers share the weights copy-on-write (no forward pass runs in the master).
+    """
+    get_model()
+    if captioner:
+        _load_vitgpt2_captioner()
+
+
+def model_status() -> dict:
+    return {name: dict(status) for name, status in _load_status.items()}
+
+
 def _shorten_caption(text: str, max_words: int = 60) -> str:
     words = text.strip().rstrip(".").split()
     return " ".join(words[:max_words])
 
+def _normalize_prompt(prompt: str) -> str:
+    # The CLIP tokenizer lowercases and collapses whitespace, so these prompts embed identically
+    return " ".join((prompt or "").split()).lower()
+
+
 @torch.no_grad()
-def embed_text(prompt: str) -> np.ndarray:
+def _encode_texts(prompts: List[str]) -> np.ndarray:
     model, _, tokenizer, _ = get_model()
-    tokens = tokenizer([prompt]).to(DEVICE)
+    tokens = tokenizer(prompts).to(DEVICE)
     text_feat = model.encode_text(tokens)
-    text_feat = text_feat.float().cpu().numpy()[0]
-    return text_feat
+    return text_feat.float().cpu().numpy()
+
+
+class TextBatcher:
+    """
+    Micro-batching scheduler for text encoding.
+    Callers enqueue prompts and wait on futures; one worker thread collects whatever arrives
+    within window_ms (or until max_batch items) and encodes it in a single forward pass.
+    """
+    def __init__(self, encode_fn, window_ms: float = 5.0, max_batch: int = 32):
+        self.encode_fn = encode_fn
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self._queue: "queue.Queue[Tuple[str, Future, float]]" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="text-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, prompt: str) -> Future:
+        self._ensure_worker()
+        fut: Future = Future()
+        self._queue.put((prompt, fut, time.perf_counter()))
+        return fut
+
+    def encode(self, prompts: List[str]) -> np.ndarray:
+        futures = [self.submit(p) for p in prompts]
+        return np.stack([f.result() for f in futures], axis=0)
+
+    def _collect(self) -> List[Tuple[str, Future, float]]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            unique = list(dict.fromkeys(p for p, _, _ in batch))
+            try:
+                feats = self.encode_fn(unique)
+                by_prompt = {p: feats[i] for i, p in enumerate(unique)}
+                for p, fut, _ in batch:
+                    fut.set_result(by_prompt[p])
+            except Exception as e:
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            with self._stats_lock:
+                waits = [started - t for _, _, t in batch]
+                self.batches += 1
+                self.items += len(batch)
+                self.max_batch_seen = max(self.max_batch_seen, len(batch))
+                self.total_wait += sum(waits)
+                self.max_wait = max(self.max_wait, max(waits))
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": (self.items / self.batches) if self.batches else 0.0,
+                "max_batch_size": self.max_batch_seen,
+                "avg_wait_ms": (self.total_wait / self.items * 1000.0) if self.items else 0.0,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "window_ms": self.window * 1000.0,
+                "max_batch": self.max_batch,
+            }
+
+
+_text_batcher = TextBatcher(
+    lambda prompts: _encode_texts(prompts).astype(np.float32),
+    window_ms=TEXT_BATCH_WINDOW_MS,
+    max_batch=TEXT_BATCH_MAX,
+)
+
+
+def _check_text_cache():
+    # Cached vectors belong to one CLIP model; drop them when the model changes
+    global _text_cache_key
+    key = _clip_model_key()
+    if _text_cache_key != key:
+        _text_cache.clear()
+        _text_cache_key = key
+
+
+def embed_texts(prompts: List[str]) -> np.ndarray:
+    """
+    Embed a list of prompts, returning an (N, D) float32 array.
+    Cached prompts are served from the LRU cache; the rest go through one batched encode_text call.
+    """
+    _check_text_cache()
+    keys = [_normalize_prompt(p) for p in prompts]
+    found = {}
+    misses: List[str] = []
+    for key in keys:
+        if key in found:
+            continue
+        vec = _text_cache.get(key)
+        found[key] = vec
+        if vec is None:
+            misses.append(key)
+
+    if misses:
+        if TEXT_BATCHING:
+            feats = _text_batcher.encode(misses)
+        else:
+            feats = _encode_texts(misses).astype(np.float32)
+        for key, vec in zip(misses, feats):
+            vec.setflags(write=False)
+            _text_cache.put(key, vec)
+            found[key] = vec
+
+    if not keys:
+        return np.zeros((0, embed_dim()), dtype=np.float32)
+    return np.stack([found[key] for key in keys], axis=0)
+
+
+def embed_text(prompt: str) -> np.ndarray:
+    return embed_texts([prompt])[0]
+
+
+def text_cache_stats() -> dict:
+    return _text_cache.stats()
+
+
+def text_batcher_stats() -> dict:
+    return dict(_text_batcher.stats(), enabled=TEXT_BATCHING)
 
 
 @torch.no_grad()
@@ -102,6 +413,57 @@ def embed_image_pil(img: Image.Image) -> np.ndarray:
     return img_feat
 
 
+@torch.no_grad()
+def embed_image_batch(tensor: torch.Tensor) -> np.ndarray:
+    """
+    Embed a batch of CLIP-preprocessed images (B, 3, H, W) -> (B, D) float32.
+    """
+    model, _, _, _ = get_model()
+    img_feat = model.encode_image(tensor.to(DEVICE))
+    return img_feat.float().cpu().numpy()
+
+
+# Both models work at 224px; decode large images only down to about twice that
+DECODE_MIN_SIDE = int(os.environ.get("DECODE_MIN_SIDE", "448"))
+# Modes Image.reduce handles; palette, 1-bit and 16/32-bit images are converted first
+REDUCE_MODES = ("L", "LA", "RGB", "RGBA", "RGBX", "CMYK")
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+def load_rgb(path: str, min_side: int = DECODE_MIN_SIDE) -> Image.Image:
+    """
+    Decode an image to RGB, downscaled early so its shorter side stays >= min_side.
+    JPEGs are decoded at reduced DCT scale (Image.draft); other formats are reduced by an
+    integer factor right after decoding, before the RGB conversion (modes reduce cannot
+    handle are converted to RGB first).
+    """
+    with Image.open(path) as im:
+        w, h = im.size
+        if min_side > 0 and min(w, h) > min_side:
+            scale = min_side / float(min(w, h))
+            im.draft("RGB", (int(w * scale + 0.5), int(h * scale + 0.5)))
+        im.load()
+        factor = min(im.size) // min_side if min_side > 0 else 1
+        if factor >= 2:
+            if im.mode not in REDUCE_MODES:
+                im = im.convert("RGB")
+            im = im.reduce(factor)
+        return im.convert("RGB")
+
+
+def save_upload(image_file, dst_path: str) -> str:
+    """
+    Stream an uploaded file-like object to disk in chunks (never the whole upload in memory).
+    Returns the sha256 of the content, computed on the way.
+    """
+    h = hashlib.sha256()
+    with open(dst_path, "wb") as f:
+        for chunk in iter(lambda: image_file.read(UPLOAD_CHUNK_BYTES), b""):
+            h.update(chunk)
+            f.write(chunk)
+    return h.hexdigest()
+
+
 def allowed_ext(fname: str) -> bool:
     ext = os.path.splitext(fname.lower())[1]
     return ext in {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
@@ -112,11 +474,19 @@ def ingest_image_file(
     image_file,
     filename_hint: str = None,
     user_description: Optional[str] = None,
-) -> Tuple[str, str, Optional[str]]:
+    caption_queue=None,
+) -> Tuple[str, str, Optional[str], str, bool]:
     """
     Save an uploaded image file to disk, embed it, and add to index.
     image_file: a file-like object (e.g., from Flask's request.files['image'])
-    Returns (ext_id, saved_path, caption).
+    caption_queue: optional backend.captioning.CaptionQueue. When given, the row is stored
+                   right after the CLIP embedding with its auto caption pending, and the
+                   queue fills in the caption (and re-blends the vector) in the background.
+    An upload whose sha256 (or dHash, with DEDUP_PHASH=1) matches an active image is not
+    stored; the existing image is returned without running any image model. A description
+    sent with the duplicate replaces the existing image's user caption.
+    Returns (ext_id, saved_path, description, description_source, duplicate), where
+    description_source is "user", "auto" or "none" (see DESCRIPTION_SOURCES).
     """
     os.makedirs(DEFAULT_IMAGES_DIR, exist_ok=True)
     ext = os.path.splitext(filename_hint or "image.jpg")[1] or ".jpg"
@@ -126,31 +496,52 @@ def ingest_image_file(
     ext_id = str(uuid.uuid4())
     saved_path = os.path.join(DEFAULT_IMAGES_DIR, f"{ext_id}{ext}")
 
-    # Save file
-    with open(saved_path, "wb") as f:
-        f.write(image_file.read())
+    # Save file (streamed), then decode once; the same image feeds CLIP and the captioner
+    content_hash = save_upload(image_file, saved_path)
+    user_caption = (user_description or "").strip() or None
+    existing = index.find_duplicate(content_hash=content_hash)
+    if existing is not None:
+        os.remove(saved_path)
+        return _use_duplicate(index, existing, user_caption)
+
+    img = load_rgb(saved_path)
+    phash = None
+    if DEDUP_PHASH:
+        phash = dhash(img)
+        existing = index.find_duplicate(phash=phash)
+        if existing is not None:
+            os.remove(saved_path)
+            return _use_duplicate(index, existing, user_caption)
+
+    # Thumbnails come from the already decoded image; a failure here must not fail the ingest
+    try:
+        save_thumbnails(img, saved_path)
+    except Exception as e:
+        print(f"thumbnails for {saved_path} failed: {e}")
 
     # Embed
-    img = Image.open(saved_path).convert("RGB")
     image_vec = embed_image_pil(img).astype(np.float32)
 
-    # Generate an automatic caption once per ingest
-    auto_caption, _ = generate_short_description(saved_path, max_new_tokens=80, max_words=60)
+    if caption_queue is not None:
+        index.add(
+            [ext_id],
+            [saved_path],
+            blend_with_captions(image_vec, None, user_caption),
+            captions=[None],
+            user_captions=[user_caption],
+            actives=[1],
+            caption_statuses=["pending"],
+            content_hashes=[content_hash],
+            phashes=[phash],
+        )
+        caption_queue.submit(ext_id, saved_path, image_vec=image_vec)
+        return ext_id, saved_path, user_caption, "user" if user_caption else "auto", False
 
-    user_caption = (user_description or "").strip() or None
+    # Generate an automatic caption once per ingest
+    auto_caption = generate_captions([img], max_new_tokens=80, max_words=60)[0]
 
     # Blend image + text
-    text_parts: List[Tuple[str, float]] = []
-    # auto caption weight 0.2, user caption weight 0.35 (later normalized to 1 - image_weight)
-    if auto_caption:
-        text_parts.append((auto_caption, 0.20))
-    if user_caption:
-        text_parts.append((user_caption, 0.35))
-    blended_vec = _blend_image_text_vectors(
-        image_vec,
-        text_parts,
-        image_weight=0.8,
-    )
+    blended_vec = blend_with_captions(image_vec, auto_caption, user_caption)
 
     # Add to index
     index.add(
@@ -160,8 +551,28 @@ def ingest_image_file(
         captions=[auto_caption],
         user_captions=[user_caption],
         actives=[1],
+        content_hashes=[content_hash],
+        phashes=[phash],
     )
-    return ext_id, saved_path, user_caption or auto_caption
+    return ext_id, saved_path, user_caption or auto_caption, "user" if user_caption else "auto", False
+
+
+def _use_duplicate(
+    index: ImageVectorIndex,
+    existing: Tuple[str, str, Optional[str], Optional[str]],
+    user_caption: Optional[str],
+) -> Tuple[str, str, Optional[str], str, bool]:
+    """
+    ingest_image_file result for an upload that matched an existing image. A new
+    description is stored on that image rather than dropped.
+    """
+    ext_id, path, caption, existing_user_caption = existing
+    if user_caption:
+        index.set_user_caption(ext_id, user_caption)
+        return ext_id, path, user_caption, "user", True
+    if existing_user_caption:
+        return ext_id, path, existing_user_caption, "user", True
+    return ext_id, path, caption, "auto" if caption else "none", True
 
 
 def build_index_from_folder(
@@ -170,118 +581,36 @@ def build_index_from_folder(
     batch_size: int = 32,
 ) -> int:
     """
-    Walk a folder, embed all images, and append them to the main index.
-    Uses randomly generated UUIDs as ext_ids; paths are absolute saved paths (copied into data/images).
+    Walk a folder, embed, caption and blend all images, and append them to the main index.
+    Rows come out the same as /ingest-image rows. See backend.ingest for the CLI.
     Returns count of newly ingested images.
     """
-    assert os.path.isdir(folder), f"Folder not found: {folder}"
-    os.makedirs(DEFAULT_IMAGES_DIR, exist_ok=True)
-
-    # Collect image paths
-    files = []
-    for root, _, fnames in os.walk(folder):
-        for fn in fnames:
-            if allowed_ext(fn):
-                files.append(os.path.join(root, fn))
-    files.sort()
-    if not files:
-        return 0
-
-    model, preprocess, _, _ = get_model()
-
-    ingested = 0
-    ext_ids: List[str] = []
-    paths: List[str] = []
-    vecs: List[np.ndarray] = []
-
-    def flush():
-        nonlocal ext_ids, paths, vecs, ingested
-        if not vecs:
-            return
-        arr = np.vstack(vecs).astype(np.float32)
-        index.add(ext_ids, paths, arr)
-        ingested += len(ext_ids)
-        ext_ids, paths, vecs = [], [], []
-
-    with torch.no_grad():
-        batch_imgs = []
-        batch_meta = []
-
-        for src_path in files:
-            try:
-                img = Image.open(src_path).convert("RGB")
-            except Exception:
-                continue
-
-            # Copy image into the central images folder with new UUID to ensure stable ID & path
-            ext = os.path.splitext(src_path)[1]
-            if ext.lower() not in [".jpg", ".jpeg", ".png", ".bmp", ".webp"]:
-                ext = ".jpg"
-            ext_id = str(uuid.uuid4())
-            dst_path = os.path.join(DEFAULT_IMAGES_DIR, f"{ext_id}{ext}")
-
-            # Save (re-encode) to maintain consistent format
-            try:
-                img.save(dst_path)
-            except Exception:
-                # Fallback to PNG
-                dst_path = os.path.join(DEFAULT_IMAGES_DIR, f"{ext_id}.png")
-                img.save(dst_path)
-
-            batch_imgs.append(preprocess(img))
-            batch_meta.append((ext_id, dst_path))
+    from backend.ingest import ingest_folder
 
-            if len(batch_imgs) == batch_size:
-                tensor = torch.stack(batch_imgs).to(DEVICE)
-                feats = model.encode_image(tensor).float().cpu().numpy()
-                for (eid, pth), vec in zip(batch_meta, feats):
-                    ext_ids.append(eid)
-                    paths.append(pth)
-                    vecs.append(vec)
-                batch_imgs, batch_meta = [], []
+    return ingest_folder(folder, index, batch_size=batch_size)
 
-                if len(vecs) >= 512:  # chunk FAISS writes
-                    flush()
 
-        # tail
-        if batch_imgs:
-            tensor = torch.stack(batch_imgs).to(DEVICE)
-            feats = model.encode_image(tensor).float().cpu().numpy()
-            for (eid, pth), vec in zip(batch_meta, feats):
-                ext_ids.append(eid)
-                paths.append(pth)
-                vecs.append(vec)
-
-        flush()
-
-    return ingested
-
-
-def create_index(dim_override: int = None) -> ImageVectorIndex:
+def create_index(dim_override: int = None, read_only: bool = False) -> ImageVectorIndex:
     """
     Utility to create an ImageVectorIndex with the correct dimensionality.
+    read_only opens it as a reader process (see ImageVectorIndex).
     """
-    _, _, _, embed_dim = get_model()
-    dim = int(dim_override or embed_dim)
-    return ImageVectorIndex(dim=dim)
+    dim = int(dim_override or embed_dim())
+    return ImageVectorIndex(dim=dim, text_embedder=embed_texts, read_only=read_only)
 
 @torch.no_grad()
-def generate_short_description(image_path: str, max_new_tokens: int = 80, max_words: int = 60) -> Tuple[str, float]:
+def captions_from_pixel_values(
+    pixel_values: torch.Tensor,
+    max_new_tokens: int = 80,
+    max_words: int = 60,
+) -> List[str]:
     """
-    Generate a plain-English description for an image using the ViT-GPT2 captioning model.
-
-    Returns:
-        (caption, quality_score)
-        - caption: string
-        - quality_score: a rough confidence proxy in [0..1] (placeholder 1.0)
+    Caption a batch of ViT-preprocessed images (B, 3, H, W) with one ViT-GPT2 generate call.
     """
-    model, extractor, tokenizer = _load_vitgpt2_captioner()
-
-    img = Image.open(image_path).convert("RGB")
-    pixel_values = extractor(images=img, return_tensors="pt").pixel_values.to(DEVICE)
+    model, _, tokenizer = _load_vitgpt2_captioner()
 
     outputs = model.generate(
-        pixel_values,
+        pixel_values.to(DEVICE),
         max_new_tokens=max_new_tokens,
         num_beams=4,
         do_sample=False,
@@ -289,8 +618,37 @@ def generate_short_description(image_path: str, max_new_tokens: int = 80, max_wo
         no_repeat_ngram_size=2,
         repetition_penalty=1.05,
     )
-    caption = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    caption = _shorten_caption(caption, max_words=max_words)
+    captions = tokenizer.batch_decode(outputs, skip_special_tokens=True)
+    return [_shorten_caption(c, max_words=max_words) for c in captions]
+
+
+def generate_captions(
+    images: List[Image.Image],
+    max_new_tokens: int = 80,
+    max_words: int = 60,
+) -> List[str]:
+    """
+    Caption a batch of RGB images with one ViT-GPT2 generate call.
+    The extractor resizes every image to the same size, so pixel_values stack into one batch.
+    """
+    if not images:
+        return []
+    _, extractor, _ = _load_vitgpt2_captioner()
+    pixel_values = extractor(images=images, return_tensors="pt").pixel_values
+    return captions_from_pixel_values(pixel_values, max_new_tokens=max_new_tokens, max_words=max_words)
+
+
+def generate_short_description(image_path: str, max_new_tokens: int = 80, max_words: int = 60) -> Tuple[str, float]:
+    """
+    Generate a plain-English description for an image using the ViT-GPT2 captioning model.
+
+    Returns:
+        (caption, quality_score)
+        - caption: string
+        - quality_score: a rough confidence proxy in [0..1] (placeholder 1.0)
+    """
+    img = load_rgb(image_path)
+    caption = generate_captions([img], max_new_tokens=max_new_tokens, max_words=max_words)[0]
 
     quality = 1.0
     return caption, float(quality)
@@ -1,8 +1,18 @@
 import os
 import sqlite3
+import threading
 import faiss
 import numpy as np
-from typing import List, Tuple, Optional
+from typing import Callable, Iterator, List, Tuple, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory lock; keep to one writer by hand
+    fcntl = None
+
+from backend.meta_store import MetaColumns, _vec_to_blob, select_rows
+from backend.rwlock import RWLock
+from backend.vector_log import VectorLog, OP_ADD, OP_DELETE, OP_UPDATE
 
 from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parents[1]
@@ -12,6 +22,30 @@ DEFAULT_IMAGES_DIR = str(DEFAULT_DATA_DIR / "images")
 DEFAULT_INDEX_PATH = str(DEFAULT_DATA_DIR / "index.faiss")
 DEFAULT_META_DB     = str(DEFAULT_DATA_DIR / "meta.db")
 
+# Adds are appended (and fsynced) to <index>.log; the full index is snapshotted in the background.
+INDEX_SNAPSHOT_SECS = float(os.environ.get("INDEX_SNAPSHOT_SECS", "60"))
+INDEX_DURABILITY = os.environ.get("INDEX_DURABILITY", "fsync")  # fsync | flush
+# Read-only readers map the snapshot instead of copying it into the heap, and poll for
+# new snapshots / metadata commits from the writer
+INDEX_MMAP = os.environ.get("INDEX_MMAP", "1") != "0"
+INDEX_RELOAD_SECS = float(os.environ.get("INDEX_RELOAD_SECS", "2"))
+
+# ANN index type for new/rebuilt indexes: flat | ivf_flat | ivf_pq | hnsw
+INDEX_TYPE = os.environ.get("INDEX_TYPE", "flat")
+INDEX_NLIST = int(os.environ.get("INDEX_NLIST", "1024"))
+INDEX_PQ_M = int(os.environ.get("INDEX_PQ_M", "64"))
+INDEX_HNSW_M = int(os.environ.get("INDEX_HNSW_M", "32"))
+INDEX_NPROBE = int(os.environ.get("INDEX_NPROBE", "16"))
+INDEX_EF_SEARCH = int(os.environ.get("INDEX_EF_SEARCH", "64"))
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# Description source filters for list_page
+DESCRIPTION_SOURCES = {
+    "user": "user_caption IS NOT NULL",
+    "auto": "user_caption IS NULL AND caption IS NOT NULL",
+    "none": "user_caption IS NULL AND caption IS NULL",
+}
+
 def _ensure_dirs():
     Path(DEFAULT_DATA_DIR).mkdir(parents=True, exist_ok=True)
     Path(DEFAULT_IMAGES_DIR).mkdir(parents=True, exist_ok=True)
@@ -36,43 +70,408 @@ def _ensure_column(cur: sqlite3.Cursor, table: str, name: str, col_type: str) ->
 #     os.makedirs(DEFAULT_IMAGES_DIR, exist_ok=True)
 
 
+def index_factory_string(
+    index_type: str,
+    ntotal: int,
+    nlist: int = INDEX_NLIST,
+    pq_m: int = INDEX_PQ_M,
+    hnsw_m: int = INDEX_HNSW_M,
+) -> str:
+    """
+    faiss.index_factory description for an index type. nlist is capped so every
+    IVF centroid gets ~39 training points (faiss warns below that).
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"index_type must be one of {INDEX_TYPES}, got {index_type!r}")
+    nlist = max(1, min(nlist, ntotal // 39))
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{nlist},PQ{pq_m}"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m},Flat"
+    return "Flat"
+
+
+def make_index(
+    dim: int,
+    index_type: str,
+    vectors: Optional[np.ndarray] = None,
+    ids: Optional[np.ndarray] = None,
+    **params,
+) -> faiss.Index:
+    """
+    Build an inner-product index of the given type, trained on and filled with `vectors`
+    under int64 `ids` (default 0..N-1).
+    Flat and HNSW indexes are wrapped in IndexIDMap2; IVF indexes keep ids in their
+    inverted lists natively, with a hashtable direct map for reconstruct/update by id.
+    """
+    n = 0 if vectors is None else vectors.shape[0]
+    base = faiss.index_factory(dim, index_factory_string(index_type, n, **params), faiss.METRIC_INNER_PRODUCT)
+    if n and not base.is_trained:
+        base.train(vectors)
+    ivf = faiss.try_extract_index_ivf(base)
+    if ivf is not None:
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+        index = base
+    else:
+        index = faiss.IndexIDMap2(base)
+    if n:
+        if ids is None:
+            ids = np.arange(n, dtype=np.int64)
+        index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+    return index
+
+
+def _inner(index: faiss.Index) -> faiss.Index:
+    if isinstance(index, faiss.IndexIDMap2):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def _is_id_mapped(index: faiss.Index) -> bool:
+    if isinstance(index, faiss.IndexIDMap2):
+        return True
+    ivf = faiss.try_extract_index_ivf(index)
+    return ivf is not None and ivf.direct_map.type == faiss.DirectMap.Hashtable
+
+
+def index_type_of(index: faiss.Index) -> str:
+    inner = _inner(index)
+    if faiss.try_extract_index_ivf(inner) is not None:
+        return "ivf_pq" if isinstance(faiss.downcast_index(inner), faiss.IndexIVFPQ) else "ivf_flat"
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def describe_index(index: faiss.Index) -> str:
+    index_type = index_type_of(index)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return f"{index_type}(nlist={ivf.nlist})"
+    return index_type
+
+
+def index_ids(index: faiss.Index) -> np.ndarray:
+    """
+    The int64 ids stored in an index (row positions for legacy, non id-mapped indexes).
+    """
+    if isinstance(index, faiss.IndexIDMap2):
+        return faiss.vector_to_array(index.id_map).astype(np.int64)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and _is_id_mapped(index):
+        invlists = ivf.invlists
+        parts = []
+        for list_no in range(ivf.nlist):
+            size = invlists.list_size(list_no)
+            if size:
+                parts.append(faiss.rev_swig_ptr(invlists.get_ids(list_no), size).copy())
+        return np.concatenate(parts).astype(np.int64) if parts else np.zeros(0, dtype=np.int64)
+    return np.arange(index.ntotal, dtype=np.int64)
+
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _grow(arr: np.ndarray, size: int) -> np.ndarray:
+    # Capacity-doubling resize for arrays indexed by vector id
+    if size <= arr.shape[0]:
+        return arr
+    new = np.zeros((max(size, 2 * arr.shape[0]),) + arr.shape[1:], dtype=arr.dtype)
+    new[: arr.shape[0]] = arr
+    return new
+
+
 class ImageVectorIndex:
     """
     A thin wrapper around a cosine-similarity FAISS index with an SQLite metadata store.
     Vectors are stored L2-normalized and searched with inner product (cosine).
+
+    Every vector is stored under a stable int64 id equal to its SQLite faiss_rowid, so
+    removing a vector never shifts the others. Rows whose vector is physically present
+    have in_index = 1.
+
+    Metadata is loaded once into id-indexed columns (MetaColumns); writes go through to
+    SQLite under one lock, and searches never touch SQLite.
+
+    Alongside each image vector we keep a normalized text embedding of its description
+    (user_caption or caption), so re-ranking never has to run the text encoder per hit.
+    text_embedder maps a list of strings to an (N, D) array; it is only needed to
+    (re)compute caption vectors that were not passed in explicitly.
+
+    read_only=True opens the last snapshot and SQLite read-only for reader processes: no
+    vector log, no snapshots, and every mutating method raises RuntimeError. One writer
+    process owns the index files. Readers memory-map the snapshot (mmap=True), so its pages
+    come from the OS page cache and are shared between processes, and reload it when the
+    writer publishes a new one (checked every reload_interval seconds). Metadata changes
+    reach readers within reload_interval, but new and re-blended vectors only with the
+    writer's next snapshot (up to INDEX_SNAPSHOT_SECS later): a reader does not replay
+    the writer's vector log, so until then a fresh upload is not returned by its searches.
     """
     def __init__(
         self,
         dim: int,
         index_path: str = DEFAULT_INDEX_PATH,
         meta_db_path: str = DEFAULT_META_DB,
+        text_embedder: Optional[Callable[[List[str]], np.ndarray]] = None,
+        snapshot_interval: float = INDEX_SNAPSHOT_SECS,
+        durability: str = INDEX_DURABILITY,
+        read_only: bool = False,
+        mmap: bool = INDEX_MMAP,
+        reload_interval: float = INDEX_RELOAD_SECS,
     ):
         _ensure_dirs()
         self.dim = dim
+        self.read_only = read_only
+        self._owner_pid = os.getpid()
         self.index_path = index_path
+        self.log_path = index_path + ".log"
         self.meta_db_path = meta_db_path
+        self.text_embedder = text_embedder
+        self.snapshot_interval = 0 if read_only else snapshot_interval
+        self.mmap = mmap
+        self.reload_interval = reload_interval if read_only else 0
+        self._writer_lock = None
+        if not read_only:
+            self._lock_writer()
 
-        self.conn = sqlite3.connect(self.meta_db_path, check_same_thread=False)
-        self._init_meta()
+        # Serializes writers and guards the SQLite connection
+        self._lock = threading.RLock()
+        # Searches read the FAISS index and the metadata columns under the shared side; writers
+        # take the exclusive side only around changing them, never while they fsync the vector
+        # log, commit SQLite or embed text
+        self._rw = RWLock()
+        self._save_lock = threading.Lock()
+        self.conn = self._connect()
+        if not read_only:
+            self._init_meta()
 
-        if os.path.exists(self.index_path):
+        migrated = False
+        if read_only:
+            self._index_stamp = _file_stamp(self.index_path)
+            self._meta_stamp = _file_stamp(self.meta_db_path)
+            # Read before the rows are loaded, so no change can fall between the two
+            self._meta_version = self._read_meta_version(self.conn)
+            self.index = self._read_snapshot()
+        elif os.path.exists(self.index_path):
             self.index = faiss.read_index(self.index_path)
             # sanity check for dimension
             if self.index.d != dim:
                 raise ValueError(
                     f"Existing index dim={self.index.d} does not match requested dim={dim}"
                 )
+            if not _is_id_mapped(self.index):
+                self._migrate_positional()
+                migrated = True
+        elif INDEX_TYPE in ("ivf_flat", "ivf_pq"):
+            # IVF needs training data; start flat and switch with `python -m backend.index_tools rebuild`
+            print(f"INDEX_TYPE={INDEX_TYPE} needs training; starting with a flat index until rebuild")
+            self.index = make_index(dim, "flat")
         else:
             # Cosine similarity = inner product with normalized vectors
-            self.index = faiss.IndexFlatIP(dim)
+            self.index = make_index(dim, INDEX_TYPE)
+        # Ids touched while a rebuild is training (None when no rebuild is running)
+        self._rebuild_touched = None
+
+        self._present = np.zeros(0, dtype=bool)
+        ids = index_ids(self.index)
+        if ids.size:
+            self._present = _grow(self._present, int(ids.max()) + 1)
+            self._present[ids] = True
+
+        self.log = None
+        self._dirty = False
+        self._next_id = None
+        if not read_only:
+            # Re-apply whatever was logged after the last snapshot. Logs written before the
+            # switch to id mapping hold 0-based row positions, i.e. faiss_rowid - 1.
+            self.log = VectorLog(self.log_path, dim, durability=durability)
+            self._dirty = self._replay_log(id_offset=1 if migrated else 0)
+            if migrated:
+                self.save()
+
+            # FAISS ids and SQLite rows are checked as id sets (see _validate_alignment).
+            self._validate_alignment()
+
+            cur = self.conn.cursor()
+            cur.execute("SELECT seq FROM sqlite_sequence WHERE name = 'images'")
+            row = cur.fetchone()
+            # _present is a capacity array (see _grow); its length is not the largest id
+            max_present = int(np.flatnonzero(self._present).max()) if self._present.any() else 0
+            self._next_id = max(row[0] if row else 0, max_present, 0) + 1
+
+        # Active ids (meta.is_active) are used as a FAISS IDSelector so inactive rows never
+        # take top_k slots
+        self._active_bits = None  # packed bitmap, rebuilt lazily after changes
+        self._n_filtered = 0  # vectors in the index that searches must skip
+
+        # ext_id, path, captions, is_active and the caption vector matrix, indexed by id
+        self.meta = MetaColumns(dim)
+        self._load_meta()
+
+        # Bumped on every change that can alter search results; result caches key on it
+        self.generation = 0
+
+        self._stop = threading.Event()
+        self._snapshot_thread = None
+        self._start_background()
+        # Threads and the SQLite connection do not survive fork. A reader renews them in the
+        # child; a writer's files stay owned by the process that opened it (see _after_fork)
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _lock_writer(self) -> None:
+        """
+        Hold an exclusive lock on <index>.lock while this writer is open, so a second writer
+        (the app, backend.ingest, backend.index_tools, backend.dedup) fails right away instead
+        of replaying and snapshotting the same vector log.
+        """
+        if fcntl is None:
+            return
+        f = open(self.index_path + ".lock", "a")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            raise RuntimeError(
+                f"{self.index_path} is open in another writer process; stop it first "
+                f"(or send the change to the running app)"
+            )
+        self._writer_lock = f
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.read_only:
+            uri = "file:" + os.path.abspath(self.meta_db_path) + "?mode=ro"
+            return sqlite3.connect(uri, uri=True, check_same_thread=False)
+        return sqlite3.connect(self.meta_db_path, check_same_thread=False)
+
+    def _read_snapshot(self) -> faiss.Index:
+        if not os.path.exists(self.index_path):
+            raise FileNotFoundError(f"{self.index_path} not found; start the writer process first")
+        index = None
+        if self.mmap:
+            try:
+                index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                print(f"cannot mmap {self.index_path} ({e}); reading it into memory")
+        if index is None:
+            index = faiss.read_index(self.index_path)
+        if index.d != self.dim:
+            raise ValueError(f"Existing index dim={index.d} does not match requested dim={self.dim}")
+        if not _is_id_mapped(index):
+            raise ValueError(f"{self.index_path} uses positional ids; open it once in the writer to migrate it")
+        return index
+
+    def _start_background(self):
+        if self.snapshot_interval > 0:
+            self._snapshot_thread = threading.Thread(
+                target=self._snapshot_loop, name="index-snapshot", daemon=True
+            )
+            self._snapshot_thread.start()
+        elif self.reload_interval > 0:
+            self._snapshot_thread = threading.Thread(
+                target=self._reload_loop, name="index-reload", daemon=True
+            )
+            self._snapshot_thread.start()
+
+    def _after_fork(self):
+        self._lock = threading.RLock()
+        self._rw = RWLock()
+        self._save_lock = threading.Lock()
+        self.conn = self._connect()
+        if self.read_only:
+            self._start_background()
+            return
+        # Two processes snapshotting the same files drop each other's log records, so the
+        # child's copy of a writer never writes, snapshots or touches the vector log. Open
+        # the writer after fork instead (gunicorn.conf.py does it in post_fork).
+        self.log = None
+        self._snapshot_thread = None
+
+    def _owns_files(self) -> bool:
+        return not self.read_only and os.getpid() == self._owner_pid
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reader processes: pick up a new snapshot (os.replace by the writer gives it a new
+        inode) and new metadata commits. Returns True if anything was reloaded.
+        """
+        changed = False
+        index_stamp = _file_stamp(self.index_path)
+        if index_stamp is not None and index_stamp != self._index_stamp:
+            index = self._read_snapshot()
+            present = np.zeros(0, dtype=bool)
+            ids = index_ids(index)
+            if ids.size:
+                present = _grow(present, int(ids.max()) + 1)
+                present[ids] = True
+            with self._rw.write():
+                self.index = index
+                self._present = present
+                self._active_bits = None
+                self._index_stamp = index_stamp
+                self.generation += 1
+            changed = True
+
+        meta_stamp = _file_stamp(self.meta_db_path)
+        if meta_stamp != self._meta_stamp:
+            conn = self._connect()
+            try:
+                version = self._read_meta_version(conn)
+                last = self._meta_version
+                if version is not None and last is not None and version[1] == last[1]:
+                    # Only the rows inserted or changed since the last reload
+                    rows = select_rows(conn, since_version=last[0]).fetchall()
+                    meta = None
+                else:
+                    # First reload after the change counter appeared, or rows were purged
+                    meta = MetaColumns(self.dim)
+                    meta.load(conn)
+            finally:
+                conn.close()
+            with self._rw.write():
+                if meta is None:
+                    self.meta.load_rows(rows)
+                else:
+                    self.meta = meta
+                self._active_bits = None
+                self._meta_stamp = meta_stamp
+                self._meta_version = version
+                self.generation += 1
+            changed = True
+        return changed
 
-        # We maintain our own mapping ID <-> row order using SQLite IDs table.
-        # We’ll keep FAISS ids implicit (row order) and store a parallel SQLite table
-        # with (faiss_rowid INTEGER PRIMARY KEY AUTOINCREMENT, ext_id TEXT UNIQUE, path TEXT).
-        # When we add vectors, we append rows in the same order.
-        # To keep things consistent across restarts, we will rebuild alignment
-        # using stored count check.
-        self._validate_alignment()
+    @staticmethod
+    def _read_meta_version(conn: sqlite3.Connection) -> Optional[Tuple[int, int]]:
+        """
+        (version, purged) from meta_version, or None for a meta.db the writer has not
+        migrated yet.
+        """
+        try:
+            return conn.execute("SELECT version, purged FROM meta_version").fetchone()
+        except sqlite3.OperationalError:
+            return None
+
+    def _reload_loop(self):
+        while not self._stop.wait(self.reload_interval):
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                print(f"index reload failed: {e}")
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("index is opened read-only; send writes to the writer process")
+        if os.getpid() != self._owner_pid:
+            raise RuntimeError(
+                f"index writer was opened in process {self._owner_pid} before fork; "
+                f"open it in the process that writes"
+            )
 
     def _init_meta(self):
         cur = self.conn.cursor()
@@ -90,18 +489,185 @@ class ImageVectorIndex:
         _ensure_column(cur, "images", "caption", "TEXT")
         _ensure_column(cur, "images", "user_caption", "TEXT")
         _ensure_column(cur, "images", "is_active", "INTEGER DEFAULT 1")
+        _ensure_column(cur, "images", "caption_vec", "BLOB")
+        # NULL/'done' = captioned, 'pending' = waiting for the background captioner, 'failed'
+        _ensure_column(cur, "images", "caption_status", "TEXT")
+        # 1 while the row's vector is physically stored in the FAISS index
+        _ensure_column(cur, "images", "in_index", "INTEGER DEFAULT 1")
+        # sha256 of the stored file and optional 64-bit dHash (hex), for dedup on ingest
+        _ensure_column(cur, "images", "content_hash", "TEXT")
+        _ensure_column(cur, "images", "phash", "TEXT")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_images_content_hash ON images(content_hash)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_images_phash ON images(phash)")
+        # Keyset pages filtered on is_active walk this instead of the whole table
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_images_active_rowid ON images(is_active, faiss_rowid)")
+        # Change counter for readers: inserting a row or changing a column MetaColumns mirrors
+        # stamps the row with the next meta_version.version, deleting rows bumps purged. A
+        # reader reloads only the rows above the version it last saw (see reload_if_changed)
+        _ensure_column(cur, "images", "version", "INTEGER DEFAULT 0")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_images_version ON images(version)")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS meta_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL,
+                purged INTEGER NOT NULL
+            )
+        """)
+        cur.execute("INSERT OR IGNORE INTO meta_version (id, version, purged) VALUES (1, 0, 0)")
+        stamp = """
+            UPDATE meta_version SET version = version + 1;
+            UPDATE images SET version = (SELECT version FROM meta_version) WHERE faiss_rowid = NEW.faiss_rowid;
+        """
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS images_version_ai AFTER INSERT ON images BEGIN {stamp} END")
+        cur.execute(
+            f"CREATE TRIGGER IF NOT EXISTS images_version_au "
+            f"AFTER UPDATE OF ext_id, path, caption, user_caption, is_active, caption_vec ON images "
+            f"BEGIN {stamp} END"
+        )
+        cur.execute(
+            "CREATE TRIGGER IF NOT EXISTS images_version_ad AFTER DELETE ON images "
+            "BEGIN UPDATE meta_version SET purged = purged + 1; END"
+        )
         self.conn.commit()
 
+    def _migrate_positional(self):
+        """
+        Convert an index written before id mapping (FAISS row i <-> faiss_rowid i + 1)
+        into an id-mapped index of the same type.
+        """
+        legacy = self.index
+        n = legacy.ntotal
+        print(f"Migrating {describe_index(legacy)} index with {n} vectors to id mapping")
+        ivf = faiss.try_extract_index_ivf(legacy)
+        params = {}
+        if ivf is not None:
+            ivf.make_direct_map()
+            params["nlist"] = ivf.nlist
+        vectors = legacy.reconstruct_n(0, n) if n else None
+        self.index = make_index(
+            self.dim,
+            index_type_of(legacy),
+            vectors,
+            ids=np.arange(1, n + 1, dtype=np.int64),
+            **params,
+        )
+
+    def _load_meta(self):
+        """
+        Load all metadata into memory. Rows that have a description but no stored caption
+        vector (older deployments) are backfilled when a text embedder is set. Readers
+        cannot write meta.db: they keep those vectors zeroed and leave the backfill to the
+        writer (they pick it up on reload).
+        """
+        missing = self.meta.load(self.conn)
+        if missing and self.text_embedder is not None and not self.read_only:
+            vecs = self._embed_descriptions([d for _, d in missing])
+            for (rowid, _), vec in zip(missing, vecs):
+                self.meta.caption_vecs[rowid] = vec
+            self.conn.executemany(
+                "UPDATE images SET caption_vec = ? WHERE faiss_rowid = ?",
+                [(_vec_to_blob(vec), rowid) for (rowid, _), vec in zip(missing, vecs)],
+            )
+            self.conn.commit()
+
+    def _embed_descriptions(self, descriptions: List[Optional[str]]) -> np.ndarray:
+        """
+        Normalized caption vectors for a list of descriptions; empty descriptions map to zeros
+        (so their text-to-text score is 0, as before).
+        """
+        out = np.zeros((len(descriptions), self.dim), dtype=np.float32)
+        todo = [(i, d) for i, d in enumerate(descriptions) if d]
+        if not todo or self.text_embedder is None:
+            return out
+        vecs = np.asarray(self.text_embedder([d for _, d in todo]), dtype=np.float32)
+        vecs = self._normalize(vecs.reshape(len(todo), self.dim))
+        for (i, _), vec in zip(todo, vecs):
+            out[i] = vec
+        return out
+
+    def _is_present(self, vec_id: int) -> bool:
+        return 0 <= vec_id < self._present.shape[0] and bool(self._present[vec_id])
+
+    def _mark_present(self, ids: np.ndarray, present: bool) -> None:
+        if len(ids):
+            self._present = _grow(self._present, int(np.max(ids)) + 1)
+            self._present[ids] = present
+        self._active_bits = None
+
+    def _set_active_ids(self, ids: np.ndarray, active: bool) -> None:
+        for vec_id in ids:
+            self.meta.is_active[int(vec_id)] = active
+        self._active_bits = None
+
+    def _active_selector(self):
+        """
+        (selector, bitmap) restricting a search to active ids, or (None, None) when every
+        indexed vector is active. Call it under self._rw.read() and keep `bitmap` alive
+        during the search. Concurrent readers may both rebuild the bitmap; they build the
+        same one.
+        """
+        bits, n_filtered = self._active_bits, self._n_filtered
+        if bits is None:
+            n = self._present.shape[0]
+            active = self.meta.active_mask(n)
+            n_filtered = int(np.count_nonzero(self._present & ~active))
+            bits = np.packbits(active, bitorder="little")
+            self._n_filtered, self._active_bits = n_filtered, bits
+        if n_filtered == 0:
+            return None, None
+        return faiss.IDSelectorBitmap(bits.shape[0], faiss.swig_ptr(bits)), bits
+
+    def _can_remove(self) -> bool:
+        # HNSW graphs do not support removal; deleted vectors stay until compaction
+        return not isinstance(_inner(self.index), faiss.IndexHNSW)
+
+    def _replay_log(self, id_offset: int = 0) -> bool:
+        """
+        Apply log records newer than the loaded snapshot. Returns True if anything was applied.
+        """
+        applied = False
+        for op, vec_id, vec in self.log.replay():
+            vec_id += id_offset
+            ids = np.array([vec_id], dtype=np.int64)
+            if op == OP_ADD:
+                if self._is_present(vec_id):
+                    continue  # already part of the snapshot
+                self.index.add_with_ids(vec[None, :], ids)
+                self._mark_present(ids, True)
+            elif op == OP_UPDATE:
+                if not self._is_present(vec_id):
+                    continue
+                self._write_vector(vec_id, vec)
+            elif op == OP_DELETE:
+                if not self._is_present(vec_id):
+                    continue
+                self.index.remove_ids(ids)
+                self._mark_present(ids, False)
+            applied = True
+        return applied
+
     def _validate_alignment(self):
-        cur = self.conn.cursor()
-        cur.execute("SELECT COUNT(1) FROM images")
-        (meta_count,) = cur.fetchone()
-        index_count = self.index.ntotal
-        if meta_count != index_count:
+        cur = self.conn.execute("SELECT faiss_rowid FROM images WHERE in_index = 1")
+        meta_ids = np.array([r[0] for r in cur.fetchall()], dtype=np.int64)
+        faiss_ids = np.flatnonzero(self._present).astype(np.int64)
+
+        orphans = np.setdiff1d(faiss_ids, meta_ids)
+        if orphans.size and self._can_remove():
+            # Vectors are logged before their metadata rows are committed; a crash in between
+            # leaves vectors without rows. Drop them.
+            print(f"Dropping {orphans.size} logged vectors without metadata rows")
+            self.index.remove_ids(orphans)
+            self._mark_present(orphans, False)
+            self.save()  # the dropped vectors must not be replayed again
+            orphans = orphans[:0]
+
+        missing = np.setdiff1d(meta_ids, faiss_ids)
+        if orphans.size or missing.size:
             # If mismatch: you can resolve by rebuilding the index externally.
             # We fail loudly to prevent corrupted results.
             raise RuntimeError(
-                f"Metadata count ({meta_count}) != FAISS vectors ({index_count}). "
+                f"Metadata ids and FAISS ids differ ({missing.size} rows without vectors, "
+                f"{orphans.size} vectors without rows). "
                 f"Rebuild the index or fix meta.db/index.faiss alignment."
             )
 
@@ -119,13 +685,22 @@ class ImageVectorIndex:
         captions: Optional[List[Optional[str]]] = None,
         user_captions: Optional[List[Optional[str]]] = None,
         actives: Optional[List[int]] = None,
+        caption_vectors: Optional[np.ndarray] = None,
+        caption_statuses: Optional[List[Optional[str]]] = None,
+        content_hashes: Optional[List[Optional[str]]] = None,
+        phashes: Optional[List[Optional[str]]] = None,
     ):
         """
         Add new vectors with external IDs and file paths.
         ext_ids: list of unique external IDs (e.g., UUIDs)
         paths: list of file paths corresponding to each vector
         vectors: shape (N, D) float32
+        caption_vectors: optional (N, D) text embeddings of user_caption or caption;
+                         computed with text_embedder when omitted
+        caption_statuses: optional per-row caption state ("pending" for async captioning)
+        content_hashes / phashes: optional sha256 / dHash per row (see find_duplicate)
         """
+        self._check_writable()
         assert len(ext_ids) == len(paths) == vectors.shape[0], "Mismatched lengths"
         if captions is None:
             captions = [None] * len(ext_ids)
@@ -133,6 +708,12 @@ class ImageVectorIndex:
             user_captions = [None] * len(ext_ids)
         if actives is None:
             actives = [1] * len(ext_ids)
+        if caption_statuses is None:
+            caption_statuses = [None] * len(ext_ids)
+        if content_hashes is None:
+            content_hashes = [None] * len(ext_ids)
+        if phashes is None:
+            phashes = [None] * len(ext_ids)
         assert len(captions) == len(ext_ids)
         assert len(user_captions) == len(ext_ids)
         assert len(actives) == len(ext_ids)
@@ -140,80 +721,489 @@ class ImageVectorIndex:
         if vectors.dtype != np.float32:
             vectors = vectors.astype(np.float32)
 
+        if caption_vectors is None:
+            caption_vectors = self._embed_descriptions(
+                [u or c for u, c in zip(user_captions, captions)]
+            )
+        else:
+            caption_vectors = np.asarray(caption_vectors, dtype=np.float32).reshape(len(ext_ids), self.dim)
+            norms = np.linalg.norm(caption_vectors, axis=1, keepdims=True)
+            caption_vectors = np.where(norms > 0, caption_vectors / (norms + 1e-12), 0.0).astype(np.float32)
+
         vectors = self._normalize(vectors)
-        self.index.add(vectors)
+        with self._lock:
+            ids = np.arange(self._next_id, self._next_id + len(ext_ids), dtype=np.int64)
+            self._next_id += len(ext_ids)
+            self.log.append(OP_ADD, ids.tolist(), vectors)
+            if self._rebuild_touched is not None:
+                self._rebuild_touched.update(ids.tolist())
 
-        cur = self.conn.cursor()
-        cur.executemany(
-            "INSERT INTO images (ext_id, path, caption, user_caption, is_active) VALUES (?, ?, ?, ?, ?)",
-            list(zip(ext_ids, paths, captions, user_captions, actives)),
-        )
-        self.conn.commit()
-        self.save()
+            cur = self.conn.cursor()
+            cur.executemany(
+                "INSERT INTO images (faiss_rowid, ext_id, path, caption, user_caption, is_active, "
+                "caption_vec, caption_status, in_index, content_hash, phash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, ?, ?)",
+                [
+                    (int(i), e, p, c, u, a, _vec_to_blob(v), st, h, ph)
+                    for i, e, p, c, u, a, v, st, h, ph in zip(
+                        ids, ext_ids, paths, captions, user_captions, actives, caption_vectors,
+                        caption_statuses, content_hashes, phashes,
+                    )
+                ],
+            )
+            self.conn.commit()
+            # Vectors and their metadata become searchable together
+            with self._rw.write():
+                self.index.add_with_ids(vectors, ids)
+                self._mark_present(ids, True)
+                self._dirty = True
+                for i, e, p, c, u, a, v in zip(ids, ext_ids, paths, captions, user_captions, actives, caption_vectors):
+                    self.meta.set(int(i), e, p, c, u, a, v)
+                self._active_bits = None
+                self.generation += 1
 
-    def search(self, query_vector: np.ndarray, top_k: int = 5) -> List[Tuple[str, str, float, Optional[str], Optional[str], int]]:
+    def _search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None, sel=None):
+        if faiss.try_extract_index_ivf(self.index) is not None:
+            return faiss.SearchParametersIVF(sel=sel, nprobe=int(nprobe or INDEX_NPROBE))
+        if isinstance(_inner(self.index), faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=sel, efSearch=int(ef_search or INDEX_EF_SEARCH))
+        if sel is not None:
+            return faiss.SearchParameters(sel=sel)
+        return None
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 5,
+        return_caption_vecs: bool = False,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        include_inactive: bool = False,
+    ):
         """
         Search by a single query vector.
+        Inactive rows are filtered inside FAISS (IDSelector over active ids), so up to top_k
+        active hits come back; include_inactive=True searches everything.
+        nprobe / ef_search override INDEX_NPROBE / INDEX_EF_SEARCH for IVF / HNSW indexes.
         Returns list of (ext_id, path, score, caption, user_caption, is_active) sorted by score desc.
+        With return_caption_vecs=True returns (results, caption_vecs) where caption_vecs is a
+        (len(results), D) matrix of normalized description vectors (zeros when no description).
         """
         if query_vector.ndim == 1:
             query_vector = query_vector[None, :]
-        if query_vector.dtype != np.float32:
-            query_vector = query_vector.astype(np.float32)
-        query_vector = self._normalize(query_vector)
+        results, caption_vecs = self.search_batch(
+            query_vector[:1], top_k, nprobe=nprobe, ef_search=ef_search, include_inactive=include_inactive
+        )
+        if return_caption_vecs:
+            return results[0], caption_vecs[0, :len(results[0])]
+        return results[0]
 
-        scores, indices = self.index.search(query_vector, top_k)
-        idxs = indices[0].tolist()
-        scs = scores[0].tolist()
+    def search_batch(
+        self,
+        query_vectors: np.ndarray,
+        top_k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        include_inactive: bool = False,
+    ) -> Tuple[List[List[Tuple[str, str, float, Optional[str], Optional[str], int]]], np.ndarray]:
+        """
+        Search N queries with one FAISS call.
+        Returns (results, caption_vecs): results[q] is the hit list of query q (as in search),
+        caption_vecs is (N, top_k, D) where caption_vecs[q, j] belongs to results[q][j];
+        slots past the end of a short hit list are zeros.
+        """
+        query_vectors = np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.dim)
+        query_vectors = self._normalize(query_vectors)
 
-        # Map FAISS row indices to ext_id + path
-        placeholders = ",".join("?" for _ in idxs)
-        cur = self.conn.cursor()
-        cur.execute(
-            f"""SELECT faiss_rowid, ext_id, path, caption, user_caption, is_active
-                FROM images
-                WHERE faiss_rowid IN ({placeholders})""",
-            [i + 1 for i in idxs]  # SQLite AUTOINCREMENT starts at 1; FAISS rows start at 0
-        )
-        rows = {row[0] - 1: (row[1], row[2], row[3], row[4], row[5]) for row in cur.fetchall()}  # map to 0-based
+        with self._rw.read():
+            sel, _bits = (None, None) if include_inactive else self._active_selector()
+            params = self._search_params(nprobe, ef_search, sel)
+            if params is None:
+                scores, indices = self.index.search(query_vectors, top_k)
+            else:
+                scores, indices = self.index.search(query_vectors, top_k, params=params)
 
-        results = []
-        for i, s in zip(idxs, scs):
-            if i == -1:
-                continue
-            ext_id, path, caption, user_caption, is_active = rows.get(i, ("", "", None, None, 1))
-            results.append((ext_id, path, float(s), caption, user_caption, int(is_active)))
-        return results
+            # Map FAISS ids (= faiss_rowid) to metadata by array indexing; -1 (no hit) maps
+            # to slot 0, whose caption vector is zeros
+            caption_vecs = self.meta.caption_vecs[np.maximum(indices, 0)]
+            results = []
+            for row_ids, row_scores in zip(indices.tolist(), scores.tolist()):
+                hits = []
+                for i, s in zip(row_ids, row_scores):
+                    if i == -1:
+                        continue
+                    ext_id, path, caption, user_caption, is_active = self.meta.row(i)
+                    hits.append((ext_id, path, float(s), caption, user_caption, is_active))
+                results.append(hits)
+        return results, caption_vecs
 
     def list_all(self, include_inactive: bool = True) -> List[Tuple[str, str, Optional[str], Optional[str], int]]:
-        cur = self.conn.cursor()
-        if include_inactive:
-            cur.execute("SELECT ext_id, path, caption, user_caption, is_active FROM images ORDER BY faiss_rowid ASC")
-        else:
-            cur.execute("SELECT ext_id, path, caption, user_caption, is_active FROM images WHERE is_active = 1 ORDER BY faiss_rowid ASC")
-        return cur.fetchall()
+        with self._lock:
+            cur = self.conn.cursor()
+            if include_inactive:
+                cur.execute("SELECT ext_id, path, caption, user_caption, is_active FROM images ORDER BY faiss_rowid ASC")
+            else:
+                cur.execute("SELECT ext_id, path, caption, user_caption, is_active FROM images WHERE is_active = 1 ORDER BY faiss_rowid ASC")
+            return cur.fetchall()
+
+    def list_page(
+        self,
+        after: Optional[int] = None,
+        limit: int = 100,
+        active: Optional[bool] = True,
+        source: Optional[str] = None,
+    ) -> List[Tuple[int, str, str, Optional[str], Optional[str], int]]:
+        """
+        Keyset page of metadata rows in faiss_rowid order, starting after faiss_rowid `after`.
+        active: True / False filters on is_active, None returns both.
+        source: "user", "auto" or "none" (see DESCRIPTION_SOURCES), None for any.
+        Returns (faiss_rowid, ext_id, path, caption, user_caption, is_active); the last
+        faiss_rowid is the cursor for the next page.
+        """
+        where, params = ["faiss_rowid > ?"], [after or 0]
+        if active is not None:
+            where.append("is_active = ?")
+            params.append(1 if active else 0)
+        if source is not None:
+            if source not in DESCRIPTION_SOURCES:
+                raise ValueError(f"source must be one of {sorted(DESCRIPTION_SOURCES)}, got {source!r}")
+            where.append(DESCRIPTION_SOURCES[source])
+        params.append(int(limit))
+        with self._lock:
+            cur = self.conn.execute(
+                "SELECT faiss_rowid, ext_id, path, caption, user_caption, is_active FROM images "
+                f"WHERE {' AND '.join(where)} ORDER BY faiss_rowid ASC LIMIT ?",
+                params,
+            )
+            return cur.fetchall()
+
+    def iter_rows(
+        self,
+        after: Optional[int] = None,
+        active: Optional[bool] = True,
+        source: Optional[str] = None,
+        page_size: int = 500,
+    ) -> Iterator[Tuple[int, str, str, Optional[str], Optional[str], int]]:
+        """
+        Every row list_page would return, fetched one keyset page at a time. The lock is only
+        held while a page is read, so a long stream does not block writers.
+        """
+        while True:
+            page = self.list_page(after=after, limit=page_size, active=active, source=source)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1][0]
 
     def set_user_caption(self, ext_id: str, user_caption: Optional[str]) -> None:
-        cur = self.conn.cursor()
-        cur.execute("UPDATE images SET user_caption = ? WHERE ext_id = ?", (user_caption, ext_id))
-        self.conn.commit()
+        self._check_writable()
+        with self._lock:
+            rowid = self.meta.lookup(ext_id)
+            if rowid is None:
+                return
+            caption = self.meta.captions[rowid]
+            # Description changed -> recompute its caption vector
+            vec = self._embed_descriptions([user_caption or caption])[0]
+            self.conn.execute(
+                "UPDATE images SET user_caption = ?, caption_vec = ? WHERE faiss_rowid = ?",
+                (user_caption, _vec_to_blob(vec), rowid),
+            )
+            self.conn.commit()
+            with self._rw.write():
+                self.meta.user_captions[rowid] = user_caption
+                self.meta.caption_vecs[rowid] = vec
+                self.generation += 1
+
+    def set_caption(
+        self,
+        ext_id: str,
+        caption: Optional[str],
+        blend: Optional[Callable[[Optional[str], Optional[str]], np.ndarray]] = None,
+        status: str = "done",
+    ) -> None:
+        """
+        Store an auto caption produced after ingest. When blend is given, blend(caption,
+        user_caption) replaces the row's FAISS vector (the image embedding re-blended with
+        the new caption). It is called under the lock with the row's current user_caption,
+        so a description edited while the caption was generated is not lost.
+        """
+        self._check_writable()
+        with self._lock:
+            rowid = self.meta.lookup(ext_id)
+            if rowid is None:
+                return
+            user_caption = self.meta.user_captions[rowid]
+            vec = self._embed_descriptions([user_caption or caption])[0]
+            self.conn.execute(
+                "UPDATE images SET caption = ?, caption_vec = ?, caption_status = ? WHERE faiss_rowid = ?",
+                (caption, _vec_to_blob(vec), status, rowid),
+            )
+            self.conn.commit()
+            with self._rw.write():
+                self.meta.captions[rowid] = caption
+                self.meta.caption_vecs[rowid] = vec
+                self.generation += 1
+            if blend is not None and self._is_present(rowid):
+                self.update_vector(rowid, blend(caption, user_caption))
+
+    def update_vector(self, vec_id: int, vector: np.ndarray) -> None:
+        """
+        Replace the vector stored under id `vec_id` (= faiss_rowid).
+        """
+        self._check_writable()
+        vec = self._normalize(np.asarray(vector, dtype=np.float32).reshape(1, self.dim))
+        with self._lock:
+            if not self._is_present(vec_id):
+                raise KeyError(f"vector id {vec_id} is not in the index")
+            self.log.append(OP_UPDATE, [vec_id], vec)
+            with self._rw.write():
+                self._write_vector(vec_id, vec[0])
+                self._dirty = True
+                self.generation += 1
+            if self._rebuild_touched is not None:
+                self._rebuild_touched.add(vec_id)
+
+    def _write_vector(self, vec_id: int, vec: np.ndarray) -> None:
+        ids = np.array([vec_id], dtype=np.int64)
+        inner = _inner(self.index)
+        if isinstance(inner, faiss.IndexHNSW):
+            # HNSW cannot remove; overwrite the stored vector and keep the existing graph links
+            pos = int(np.flatnonzero(index_ids(self.index) == vec_id)[0])
+            storage = faiss.downcast_index(inner.storage)
+            xb = faiss.rev_swig_ptr(storage.get_xb(), storage.ntotal * self.dim)
+            xb.reshape(storage.ntotal, self.dim)[pos] = vec
+            return
+        self.index.remove_ids(ids)
+        self.index.add_with_ids(vec[None, :], ids)
+
+    def remove(self, ext_id: str) -> bool:
+        """
+        Delete an image from search: the row is deactivated and its vector removed from
+        the index. On HNSW indexes the vector stays (inactive) until `compact`.
+        Returns False if ext_id is unknown.
+        """
+        self._check_writable()
+        with self._lock:
+            vec_id = self.meta.lookup(ext_id)
+            if vec_id is None:
+                return False
+            in_index = 1 if self._is_present(vec_id) else 0
+            if in_index and self._can_remove():
+                ids = np.array([vec_id], dtype=np.int64)
+                self.log.append(OP_DELETE, [vec_id])
+                with self._rw.write():
+                    self.index.remove_ids(ids)
+                    self._mark_present(ids, False)
+                    self._dirty = True
+                in_index = 0
+                if self._rebuild_touched is not None:
+                    self._rebuild_touched.add(vec_id)
+            with self._rw.write():
+                self._set_active_ids(np.array([vec_id], dtype=np.int64), False)
+                self.generation += 1
+            self.conn.execute(
+                "UPDATE images SET is_active = 0, in_index = ? WHERE faiss_rowid = ?",
+                (in_index, vec_id),
+            )
+            self.conn.commit()
+            return True
+
+    def reconstruct_all(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        All stored (ids, vectors); vectors are approximate for PQ indexes.
+        """
+        with self._lock:
+            ids = index_ids(self.index)
+            if ids.size == 0:
+                return ids, np.zeros((0, self.dim), dtype=np.float32)
+            if isinstance(self.index, faiss.IndexIDMap2):
+                # id_map order is the inner index's storage order
+                return ids, _inner(self.index).reconstruct_n(0, ids.size)
+            return ids, self.index.reconstruct_batch(ids)
+
+    def rebuild(self, index_type: str, keep_ids: Optional[np.ndarray] = None, **params) -> None:
+        """
+        Train a new index of `index_type` on the stored vectors and swap it in atomically.
+        keep_ids restricts the new index to those ids. Adds, updates and removals that
+        happen while training are carried over before the swap.
+        """
+        self._check_writable()
+        with self._lock:
+            ids, vectors = self.reconstruct_all()
+            self._rebuild_touched = set()
+        try:
+            if keep_ids is not None:
+                mask = np.isin(ids, keep_ids)
+                ids, vectors = ids[mask], vectors[mask]
+            new_index = make_index(self.dim, index_type, vectors, ids=ids, **params)
+            with self._lock:
+                touched = np.array(sorted(self._rebuild_touched), dtype=np.int64)
+                if touched.size:
+                    live = touched[[self._is_present(int(i)) for i in touched]]
+                    if isinstance(_inner(new_index), faiss.IndexHNSW):
+                        # HNSW cannot remove; build it once more from the current vectors
+                        cur_ids, cur_vecs = self.reconstruct_all()
+                        mask = np.isin(cur_ids, ids) | np.isin(cur_ids, live)
+                        new_index = make_index(self.dim, index_type, cur_vecs[mask], ids=cur_ids[mask], **params)
+                    else:
+                        new_index.remove_ids(touched)
+                        if live.size:
+                            new_index.add_with_ids(self.index.reconstruct_batch(live), live)
+                old_ids = index_ids(self.index)
+                with self._rw.write():
+                    self.index = new_index
+                    self._present[:] = False
+                    self._mark_present(index_ids(self.index), True)
+                    self.generation += 1
+                dropped = np.setdiff1d(old_ids, index_ids(self.index))
+                if dropped.size:
+                    self.conn.executemany(
+                        "UPDATE images SET in_index = 0 WHERE faiss_rowid = ?",
+                        [(int(i),) for i in dropped],
+                    )
+                    self.conn.commit()
+                self._dirty = True
+        finally:
+            self._rebuild_touched = None
+        self.save()
+
+    def compact(self, purge: bool = False) -> int:
+        """
+        Rebuild the index from active rows only, reclaiming space left by removed vectors
+        (IVF list slack, HNSW tombstones). With purge=True inactive metadata rows are
+        deleted as well. Returns the number of vectors dropped.
+        """
+        self._check_writable()
+        before = self.count()
+        with self._lock:
+            keep = np.flatnonzero(self.meta.is_active).astype(np.int64)
+        params = {}
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is not None:
+            params["nlist"] = ivf.nlist
+        self.rebuild(index_type_of(self.index), keep_ids=keep, **params)
+        if purge:
+            with self._lock:
+                cur = self.conn.execute("SELECT faiss_rowid FROM images WHERE is_active = 0 AND in_index = 0")
+                rowids = [r[0] for r in cur.fetchall()]
+                with self._rw.write():
+                    for rowid in rowids:
+                        self.meta.drop(rowid)
+                self.conn.execute("DELETE FROM images WHERE is_active = 0 AND in_index = 0")
+                self.conn.commit()
+                self.conn.execute("VACUUM")
+        return before - self.count()
+
+    def list_pending_captions(self) -> List[Tuple[str, str, Optional[str]]]:
+        """
+        Rows still waiting for an auto caption: (ext_id, path, user_caption).
+        """
+        with self._lock:
+            cur = self.conn.execute(
+                "SELECT ext_id, path, user_caption FROM images WHERE caption_status = 'pending' ORDER BY faiss_rowid ASC"
+            )
+            return cur.fetchall()
 
     def set_active(self, ext_id: str, is_active: int) -> None:
-        cur = self.conn.cursor()
-        cur.execute("UPDATE images SET is_active = ? WHERE ext_id = ?", (is_active, ext_id))
-        self.conn.commit()
+        """
+        Raises ValueError when activating a row whose vector `remove` already dropped from
+        the index: no copy of the image vector is kept, so it could never be found again.
+        Re-ingest the image instead.
+        """
+        self._check_writable()
+        with self._lock:
+            rowid = self.meta.lookup(ext_id)
+            if rowid is None:
+                return
+            if is_active and not self._is_present(rowid):
+                raise ValueError(f"image {ext_id} was removed from the index; re-ingest it to activate it")
+            self.conn.execute("UPDATE images SET is_active = ? WHERE faiss_rowid = ?", (is_active, rowid))
+            self.conn.commit()
+            with self._rw.write():
+                self._set_active_ids(np.array([rowid], dtype=np.int64), bool(is_active))
+                self.generation += 1
 
     def save(self):
-        faiss.write_index(self.index, self.index_path)
+        """
+        Write a snapshot of the index atomically (temp file + rename), then drop the
+        log records it covers.
+        """
+        if not self._owns_files():
+            return
+        with self._save_lock:
+            with self._lock:
+                data = faiss.serialize_index(self.index)
+                log_offset = self.log.size()
+                self._dirty = False
+            tmp = self.index_path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.index_path)
+            with self._lock:
+                self.log.drop_prefix(log_offset)
+
+    def _snapshot_loop(self):
+        while not self._stop.wait(self.snapshot_interval):
+            if not self._dirty:
+                continue
+            try:
+                self.save()
+            except Exception as e:
+                print(f"index snapshot failed: {e}")
+
+    def close(self):
+        self._stop.set()
+        if not self._owns_files():
+            self.conn.close()
+            return
+        if self._dirty:
+            self.save()
+        self.log.close()
+        if self._writer_lock is not None:
+            self._writer_lock.close()  # releases the flock
+            self._writer_lock = None
 
     def count(self) -> int:
         return int(self.index.ntotal)
 
+    def find_duplicate(
+        self,
+        content_hash: Optional[str] = None,
+        phash: Optional[str] = None,
+    ) -> Optional[Tuple[str, str, Optional[str], Optional[str]]]:
+        """
+        An active image with the same sha256 (or, if given, the same dHash):
+        (ext_id, path, caption, user_caption) or None.
+        """
+        with self._lock:
+            for column, value in (("content_hash", content_hash), ("phash", phash)):
+                if not value:
+                    continue
+                row = self.conn.execute(
+                    f"SELECT ext_id, path, caption, user_caption FROM images "
+                    f"WHERE {column} = ? AND is_active = 1 ORDER BY faiss_rowid ASC LIMIT 1",
+                    (value,),
+                ).fetchone()
+                if row:
+                    return row
+        return None
+
+    def set_hashes(self, ext_id: str, content_hash: Optional[str], phash: Optional[str] = None) -> None:
+        self._check_writable()
+        with self._lock:
+            self.conn.execute(
+                "UPDATE images SET content_hash = ?, phash = ? WHERE ext_id = ?",
+                (content_hash, phash, ext_id),
+            )
+            self.conn.commit()
+
     def get_by_ext_id(self, ext_id: str) -> Optional[Tuple[int, str]]:
-        cur = self.conn.cursor()
-        cur.execute("SELECT faiss_rowid, path FROM images WHERE ext_id = ?", (ext_id,))
-        row = cur.fetchone()
-        if not row:
+        """
+        (vector id, path) for an ext_id, or None.
+        """
+        rowid = self.meta.lookup(ext_id)
+        if rowid is None:
             return None
-        faiss_row0 = row[0] - 1
-        return faiss_row0, row[1]
+        return rowid, self.meta.paths[rowid]
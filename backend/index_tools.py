@@ -0,0 +1,157 @@
+"""
+Index maintenance commands.
+
+    python -m backend.index_tools info
+    python -m backend.index_tools rebuild --type ivf_flat [--nlist 4096]
+    python -m backend.index_tools compact [--purge]
+    python -m backend.index_tools bench [--k 10] [--queries 200]
+
+rebuild trains a new index of the given type on the stored vectors and swaps it in
+atomically (snapshot via temp file + rename). Run it against the data dir while the
+writer process is stopped. Rebuilding from an ivf_pq index starts from its
+approximate (PQ-decoded) vectors.
+
+compact rebuilds the index from active rows only, reclaiming the space of removed
+vectors; --purge also deletes the metadata rows of deleted images.
+
+bench reports recall@k and per-query latency of several index configurations against
+the exact Flat baseline, using stored vectors (plus noise) as queries.
+"""
+import argparse
+import time
+from typing import List, Optional
+
+import faiss
+import numpy as np
+
+from backend.faiss_index import (
+    DEFAULT_INDEX_PATH,
+    DEFAULT_META_DB,
+    INDEX_HNSW_M,
+    INDEX_NLIST,
+    INDEX_PQ_M,
+    INDEX_TYPES,
+    ImageVectorIndex,
+    describe_index,
+    make_index,
+)
+
+
+def _open_index(args) -> ImageVectorIndex:
+    # The dimension is whatever the stored index was built with
+    dim = faiss.read_index(args.index_path).d
+    return ImageVectorIndex(dim=dim, index_path=args.index_path, meta_db_path=args.meta_db, snapshot_interval=0)
+
+
+def cmd_info(args) -> None:
+    index = _open_index(args)
+    print(f"type={describe_index(index.index)} vectors={index.count()} dim={index.dim}")
+    index.close()
+
+
+def cmd_rebuild(args) -> None:
+    index = _open_index(args)
+    before = describe_index(index.index)
+    t0 = time.perf_counter()
+    index.rebuild(args.type, nlist=args.nlist, pq_m=args.pq_m, hnsw_m=args.hnsw_m)
+    print(f"rebuilt {before} -> {describe_index(index.index)} "
+          f"({index.count()} vectors) in {time.perf_counter() - t0:.1f}s")
+    index.close()
+
+
+def cmd_compact(args) -> None:
+    index = _open_index(args)
+    dropped = index.compact(purge=args.purge)
+    print(f"compacted {describe_index(index.index)}: dropped {dropped} vectors, {index.count()} remain")
+    index.close()
+
+
+def _recall(truth: np.ndarray, found: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / float(truth.shape[0] * k)
+
+
+def _time_queries(index: faiss.Index, queries: np.ndarray, k: int, params=None):
+    found = np.zeros((queries.shape[0], k), dtype=np.int64)
+    t0 = time.perf_counter()
+    for i in range(queries.shape[0]):
+        if params is None:
+            _, idx = index.search(queries[i:i + 1], k)
+        else:
+            _, idx = index.search(queries[i:i + 1], k, params=params)
+        found[i] = idx[0]
+    return found, (time.perf_counter() - t0) / queries.shape[0] * 1000.0
+
+
+def cmd_bench(args) -> None:
+    index = _open_index(args)
+    _, vectors = index.reconstruct_all()
+    index.close()
+    n, dim = vectors.shape
+    if n == 0:
+        print("index is empty")
+        return
+
+    rng = np.random.default_rng(0)
+    queries = vectors[rng.integers(0, n, size=args.queries)]
+    queries = queries + rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    k = min(args.k, n)
+
+    flat = make_index(dim, "flat", vectors)
+    truth, flat_ms = _time_queries(flat, queries, k)
+    print(f"{n} vectors, dim={dim}, {args.queries} queries, k={k}")
+    print(f"{'config':<32}{'recall@k':>10}{'ms/query':>10}{'build s':>10}")
+    print(f"{'flat':<32}{1.0:>10.3f}{flat_ms:>10.3f}{0.0:>10.1f}")
+
+    for index_type in args.types:
+        if index_type == "flat":
+            continue
+        t0 = time.perf_counter()
+        built = make_index(dim, index_type, vectors, nlist=args.nlist, pq_m=args.pq_m, hnsw_m=args.hnsw_m)
+        build_s = time.perf_counter() - t0
+        if index_type == "hnsw":
+            sweep = [("efSearch", ef, faiss.SearchParametersHNSW(efSearch=ef)) for ef in args.ef_search]
+        else:
+            sweep = [("nprobe", p, faiss.SearchParametersIVF(nprobe=p)) for p in args.nprobe]
+        for name, value, params in sweep:
+            found, ms = _time_queries(built, queries, k, params)
+            label = f"{index_type} {name}={value}"
+            print(f"{label:<32}{_recall(truth, found):>10.3f}{ms:>10.3f}{build_s:>10.1f}")
+
+
+def _int_list(s: str) -> List[int]:
+    return [int(x) for x in s.split(",") if x]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="FAISS index maintenance")
+    parser.add_argument("--index-path", default=DEFAULT_INDEX_PATH)
+    parser.add_argument("--meta-db", default=DEFAULT_META_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("info", help="show index type and size")
+    p = sub.add_parser("compact", help="drop removed vectors and reclaim their space")
+    p.add_argument("--purge", action="store_true", help="also delete metadata rows of deleted images")
+
+    for name in ("rebuild", "bench"):
+        p = sub.add_parser(name)
+        p.add_argument("--nlist", type=int, default=INDEX_NLIST)
+        p.add_argument("--pq-m", type=int, default=INDEX_PQ_M)
+        p.add_argument("--hnsw-m", type=int, default=INDEX_HNSW_M)
+        if name == "rebuild":
+            p.add_argument("--type", required=True, choices=INDEX_TYPES)
+        else:
+            p.add_argument("--types", type=lambda s: s.split(","), default=["ivf_flat", "ivf_pq", "hnsw"])
+            p.add_argument("--k", type=int, default=10)
+            p.add_argument("--queries", type=int, default=200)
+            p.add_argument("--nprobe", type=_int_list, default=[1, 4, 16, 64])
+            p.add_argument("--ef-search", type=_int_list, default=[16, 64, 256])
+
+    args = parser.parse_args(argv)
+    {"info": cmd_info, "rebuild": cmd_rebuild, "compact": cmd_compact, "bench": cmd_bench}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
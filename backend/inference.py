@@ -0,0 +1,356 @@
+"""
+CPU inference backends for CLIP and the ViT-GPT2 captioner, selected with INFERENCE_BACKEND:
+
+    torch  fp32 PyTorch eager (default)
+    int8   dynamic INT8 quantization of the nn.Linear layers (torch.quantization.quantize_dynamic)
+    onnx   ONNX Runtime graphs for the CLIP text and image encoders and the captioner's ViT
+           encoder; GPT-2 decoding stays in torch, fed with the ONNX encoder outputs
+
+    python -m backend.inference export            # write the ONNX graphs to ONNX_DIR
+    python -m backend.inference parity            # cosine drift of each backend vs fp32
+    python -m backend.inference bench             # latency per backend
+
+The onnx backend needs `onnxruntime` and the exported graphs; without them it falls back to torch.
+"""
+import argparse
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from backend.faiss_index import DEFAULT_DATA_DIR
+
+INFERENCE_BACKENDS = ("torch", "int8", "onnx")
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch").lower()
+ONNX_DIR = os.environ.get("ONNX_DIR", str(DEFAULT_DATA_DIR / "onnx"))
+ONNX_THREADS = int(os.environ.get("ONNX_THREADS", "0"))  # 0 = onnxruntime default
+CAPTIONER_ENCODER_ONNX = os.path.join(ONNX_DIR, "vit-gpt2-encoder.onnx")
+
+
+def onnx_paths(model_name: str, pretrained: str) -> Dict[str, str]:
+    prefix = f"{model_name}-{pretrained}".replace("/", "_")
+    return {
+        "clip_text": os.path.join(ONNX_DIR, f"{prefix}-text.onnx"),
+        "clip_image": os.path.join(ONNX_DIR, f"{prefix}-image.onnx"),
+        "captioner_encoder": CAPTIONER_ENCODER_ONNX,
+    }
+
+
+def _check_backend(backend: str) -> None:
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"INFERENCE_BACKEND must be one of {INFERENCE_BACKENDS}, got {backend!r}")
+
+
+def quantize_int8(model: torch.nn.Module) -> torch.nn.Module:
+    # GPT-2 blocks use transformers' Conv1D, so in the captioner only the ViT encoder and
+    # lm_head are quantized
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _session(path: str):
+    import onnxruntime as ort
+
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if ONNX_THREADS > 0:
+        opts.intra_op_num_threads = ONNX_THREADS
+    return ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+
+
+class OnnxClip:
+    """
+    Stands in for an open_clip model: encode_text / encode_image run ONNX Runtime sessions.
+    """
+    def __init__(self, text_path: str, image_path: str):
+        self.text_session = _session(text_path)
+        self.image_session = _session(image_path)
+
+    def eval(self):
+        return self
+
+    def encode_text(self, tokens: torch.Tensor) -> torch.Tensor:
+        out = self.text_session.run(None, {"tokens": tokens.cpu().numpy().astype(np.int64)})[0]
+        return torch.from_numpy(out)
+
+    def encode_image(self, images: torch.Tensor) -> torch.Tensor:
+        out = self.image_session.run(None, {"images": images.cpu().numpy().astype(np.float32)})[0]
+        return torch.from_numpy(out)
+
+
+class OnnxCaptioner:
+    """
+    VisionEncoderDecoderModel whose ViT encoder runs in ONNX Runtime. generate() passes the
+    encoder outputs to the torch model, which only runs the GPT-2 decoder.
+    """
+    def __init__(self, model, encoder_path: str):
+        self.model = model
+        self.encoder_session = _session(encoder_path)
+
+    def eval(self):
+        return self
+
+    def encode(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        out = self.encoder_session.run(None, {"pixel_values": pixel_values.cpu().numpy().astype(np.float32)})[0]
+        return torch.from_numpy(out)
+
+    def generate(self, pixel_values: torch.Tensor, **kwargs):
+        from transformers.modeling_outputs import BaseModelOutput
+
+        encoder_outputs = BaseModelOutput(last_hidden_state=self.encode(pixel_values))
+        return self.model.generate(encoder_outputs=encoder_outputs, **kwargs)
+
+
+def _onnx_ready(paths: List[str]) -> bool:
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        print("INFERENCE_BACKEND=onnx needs onnxruntime; using torch")
+        return False
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        print(f"INFERENCE_BACKEND=onnx: missing {missing}; run `python -m backend.inference export`. Using torch")
+        return False
+    return True
+
+
+def prepare_clip(model, model_name: str, pretrained: str, backend: str = INFERENCE_BACKEND):
+    """
+    The CLIP model to run for `backend`, built from the loaded fp32 model.
+    """
+    _check_backend(backend)
+    if backend == "int8":
+        return quantize_int8(model)
+    if backend == "onnx":
+        paths = onnx_paths(model_name, pretrained)
+        if _onnx_ready([paths["clip_text"], paths["clip_image"]]):
+            return OnnxClip(paths["clip_text"], paths["clip_image"])
+    return model
+
+
+def prepare_captioner(model, backend: str = INFERENCE_BACKEND):
+    """
+    The captioner to run for `backend`, built from the loaded fp32 VisionEncoderDecoderModel.
+    """
+    _check_backend(backend)
+    if backend == "int8":
+        return quantize_int8(model)
+    if backend == "onnx" and _onnx_ready([CAPTIONER_ENCODER_ONNX]):
+        return OnnxCaptioner(model, CAPTIONER_ENCODER_ONNX)
+    return model
+
+
+class _ClipText(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, tokens):
+        return self.model.encode_text(tokens)
+
+
+class _ClipImage(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, images):
+        return self.model.encode_image(images)
+
+
+class _CaptionEncoder(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.encoder = model.encoder
+
+    def forward(self, pixel_values):
+        return self.encoder(pixel_values=pixel_values).last_hidden_state
+
+
+def _image_size(model) -> Tuple[int, int]:
+    size = getattr(model.visual, "image_size", 224)
+    return tuple(size) if isinstance(size, (tuple, list)) else (size, size)
+
+
+@torch.no_grad()
+def export_onnx(opset: int = 17) -> Dict[str, str]:
+    from backend.embedding import MODEL_NAME, MODEL_PRETRAINED, _create_captioner, _create_clip
+
+    os.makedirs(ONNX_DIR, exist_ok=True)
+    paths = onnx_paths(MODEL_NAME, MODEL_PRETRAINED)
+    model, _, tokenizer = _create_clip()
+    model = model.cpu()
+    batch = {0: "batch"}
+
+    torch.onnx.export(
+        _ClipText(model), (tokenizer(["a photo of a cat"]),), paths["clip_text"],
+        input_names=["tokens"], output_names=["features"],
+        dynamic_axes={"tokens": batch, "features": batch}, opset_version=opset,
+    )
+    torch.onnx.export(
+        _ClipImage(model), (torch.randn(1, 3, *_image_size(model)),), paths["clip_image"],
+        input_names=["images"], output_names=["features"],
+        dynamic_axes={"images": batch, "features": batch}, opset_version=opset,
+    )
+
+    captioner, extractor, _ = _create_captioner()
+    captioner = captioner.cpu()
+    size = extractor.size
+    h, w = (size["height"], size["width"]) if isinstance(size, dict) else (size, size)
+    torch.onnx.export(
+        _CaptionEncoder(captioner), (torch.randn(1, 3, h, w),), paths["captioner_encoder"],
+        input_names=["pixel_values"], output_names=["last_hidden_state"],
+        dynamic_axes={"pixel_values": batch, "last_hidden_state": batch}, opset_version=opset,
+    )
+    return paths
+
+
+def _sample_inputs(n_images: int):
+    """
+    Prompts and images for parity / bench: stored images when there are any, else noise.
+    """
+    from PIL import Image
+    from backend.faiss_index import DEFAULT_IMAGES_DIR
+
+    prompts = [
+        "a photo of a cat", "my grandson at the beach", "a birthday cake with candles",
+        "a red car on the street", "hong kong skyline at night", "a dog playing in the snow",
+        "family dinner in the garden", "an old black and white wedding photo",
+    ]
+    images = []
+    if os.path.isdir(DEFAULT_IMAGES_DIR):
+        for fn in sorted(os.listdir(DEFAULT_IMAGES_DIR))[:n_images]:
+            try:
+                images.append(Image.open(os.path.join(DEFAULT_IMAGES_DIR, fn)).convert("RGB"))
+            except Exception:
+                continue
+    rng = np.random.default_rng(0)
+    while len(images) < n_images:
+        images.append(Image.fromarray(rng.integers(0, 255, size=(256, 256, 3), dtype=np.uint8)))
+    return prompts, images
+
+
+def _backends(requested: List[str]) -> Dict[str, Tuple[object, object]]:
+    """
+    {backend: (clip, captioner)} for every requested backend that can be built here.
+    """
+    from backend.embedding import MODEL_NAME, MODEL_PRETRAINED, _create_captioner, _create_clip
+
+    clip, _, _ = _create_clip()
+    captioner, _, _ = _create_captioner()
+    built = {}
+    for backend in requested:
+        if backend == "onnx":
+            paths = onnx_paths(MODEL_NAME, MODEL_PRETRAINED)
+            if not _onnx_ready(list(paths.values())):
+                continue
+        built[backend] = (
+            prepare_clip(clip, MODEL_NAME, MODEL_PRETRAINED, backend),
+            prepare_captioner(captioner, backend),
+        )
+    return built
+
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / (np.linalg.norm(a, axis=1, keepdims=True) + 1e-12)
+    b = b / (np.linalg.norm(b, axis=1, keepdims=True) + 1e-12)
+    return (a * b).sum(axis=1)
+
+
+def _encoder_hidden(captioner, pixel_values: torch.Tensor) -> np.ndarray:
+    if isinstance(captioner, OnnxCaptioner):
+        hidden = captioner.encode(pixel_values)
+    else:
+        hidden = captioner.encoder(pixel_values=pixel_values).last_hidden_state
+    return hidden.reshape(hidden.shape[0], -1).float().numpy()
+
+
+@torch.no_grad()
+def cmd_parity(args) -> None:
+    from backend.embedding import _create_captioner, _create_clip
+
+    _, preprocess, tokenizer = _create_clip()
+    _, extractor, cap_tokenizer = _create_captioner()
+    prompts, images = _sample_inputs(args.images)
+    tokens = tokenizer(prompts)
+    image_batch = torch.stack([preprocess(im) for im in images])
+    pixel_values = extractor(images=images, return_tensors="pt").pixel_values
+
+    built = _backends(["torch"] + [b for b in args.backends if b != "torch"])
+    ref_clip, ref_cap = built["torch"]
+    ref_text = ref_clip.encode_text(tokens).float().numpy()
+    ref_image = ref_clip.encode_image(image_batch).float().numpy()
+    ref_hidden = _encoder_hidden(ref_cap, pixel_values)
+    ref_captions = cap_tokenizer.batch_decode(ref_cap.generate(pixel_values, max_new_tokens=40), skip_special_tokens=True)
+
+    print(f"{'backend':<8}{'text 1-cos mean/max':>24}{'image 1-cos mean/max':>24}{'encoder 1-cos':>16}{'same caption':>14}")
+    for backend, (clip, cap) in built.items():
+        if backend == "torch":
+            continue
+        text_drift = 1.0 - _cosine(ref_text, clip.encode_text(tokens).float().numpy())
+        image_drift = 1.0 - _cosine(ref_image, clip.encode_image(image_batch).float().numpy())
+        hidden_drift = 1.0 - _cosine(ref_hidden, _encoder_hidden(cap, pixel_values))
+        captions = cap_tokenizer.batch_decode(cap.generate(pixel_values, max_new_tokens=40), skip_special_tokens=True)
+        same = np.mean([a == b for a, b in zip(ref_captions, captions)])
+        print(
+            f"{backend:<8}"
+            f"{f'{text_drift.mean():.5f}/{text_drift.max():.5f}':>24}"
+            f"{f'{image_drift.mean():.5f}/{image_drift.max():.5f}':>24}"
+            f"{hidden_drift.mean():>16.5f}{same:>14.2f}"
+        )
+
+
+def _ms(fn, repeat: int) -> float:
+    fn()  # warm-up
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1000.0
+
+
+@torch.no_grad()
+def cmd_bench(args) -> None:
+    from backend.embedding import _create_captioner, _create_clip
+
+    _, preprocess, tokenizer = _create_clip()
+    _, extractor, _ = _create_captioner()
+    prompts, images = _sample_inputs(8)
+    tokens1, tokens8 = tokenizer(prompts[:1]), tokenizer(prompts)
+    image1 = torch.stack([preprocess(images[0])])
+    pixel1 = extractor(images=images[:1], return_tensors="pt").pixel_values
+
+    print(f"torch threads={torch.get_num_threads()}, repeat={args.repeat}")
+    print(f"{'backend':<8}{'text x1 ms':>12}{'text x8 ms':>12}{'image x1 ms':>13}{'caption x1 ms':>15}")
+    for backend, (clip, cap) in _backends(args.backends).items():
+        text1 = _ms(lambda: clip.encode_text(tokens1), args.repeat)
+        text8 = _ms(lambda: clip.encode_text(tokens8), args.repeat)
+        img = _ms(lambda: clip.encode_image(image1), args.repeat)
+        caption = _ms(lambda: cap.generate(pixel1, max_new_tokens=20, num_beams=4), max(1, args.repeat // 10))
+        print(f"{backend:<8}{text1:>12.1f}{text8:>12.1f}{img:>13.1f}{caption:>15.1f}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Inference backend tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("export", help="export the ONNX graphs to ONNX_DIR")
+    p.add_argument("--opset", type=int, default=17)
+    p = sub.add_parser("parity", help="cosine drift of each backend against fp32 torch")
+    p.add_argument("--backends", type=lambda s: s.split(","), default=["int8", "onnx"])
+    p.add_argument("--images", type=int, default=8)
+    p = sub.add_parser("bench", help="latency per backend")
+    p.add_argument("--backends", type=lambda s: s.split(","), default=list(INFERENCE_BACKENDS))
+    p.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        for name, path in export_onnx(args.opset).items():
+            print(f"{name}: {path}")
+    elif args.command == "parity":
+        cmd_parity(args)
+    else:
+        cmd_bench(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Bulk-ingest a folder of images into the main index.
+
+    python -m backend.ingest <folder> [--batch-size 16] [--workers 4] [--checkpoint PATH]
+
+Images are decoded, preprocessed and thumbnailed in a process pool; CLIP embedding and ViT-GPT2 captioning
+run in batches on the main process. Every row gets the same caption, blended vector and
+caption vector as an /ingest-image upload. Source paths that were stored are appended to a
+checkpoint file, so re-running the command after an interruption skips them.
+
+It opens the index as its writer, so run it while the app's writer process is stopped
+(the index lock makes it exit with an error otherwise).
+"""
+import argparse
+import multiprocessing as mp
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import torch
+
+from backend.embedding import (
+    allowed_ext,
+    blend_with_captions,
+    captions_from_pixel_values,
+    create_index,
+    embed_image_batch,
+    embed_texts,
+    get_model,
+    load_rgb,
+    _load_vitgpt2_captioner,
+)
+from backend.dedup import DEDUP_PHASH, dhash, sha256_file
+from backend.faiss_index import ImageVectorIndex, DEFAULT_DATA_DIR, DEFAULT_IMAGES_DIR
+from backend.thumbnails import render_thumbnails, write_thumbnails
+
+DEFAULT_CHECKPOINT = os.path.join(DEFAULT_DATA_DIR, "ingest_checkpoint.txt")
+
+# Set in each decode worker by _init_worker
+_clip_preprocess = None
+_caption_extractor = None
+
+
+def _init_worker(clip_preprocess, caption_extractor):
+    global _clip_preprocess, _caption_extractor
+    # Decode workers only run light tensor ops; keep them from oversubscribing the cores
+    torch.set_num_threads(1)
+    _clip_preprocess = clip_preprocess
+    _caption_extractor = caption_extractor
+
+
+# (src_path, sha256, dHash or None, clip_input, caption_pixel_values, thumbnails)
+Decoded = Tuple[str, Optional[str], Optional[str], Optional[np.ndarray], Optional[np.ndarray], Optional[dict]]
+
+
+def _decode(src_path: str) -> Decoded:
+    """
+    Hash and decode one image, run both preprocessors and encode its thumbnails. The dHash
+    is computed only with DEDUP_PHASH=1, as for /ingest-image. All but src_path are None if
+    the image is unreadable.
+    """
+    try:
+        content_hash = sha256_file(src_path)
+        img = load_rgb(src_path)
+    except Exception:
+        return src_path, None, None, None, None, None
+    phash = dhash(img) if DEDUP_PHASH else None
+    clip_input = _clip_preprocess(img).numpy()
+    pixel_values = _caption_extractor(images=img, return_tensors="np").pixel_values[0]
+    return src_path, content_hash, phash, clip_input, pixel_values, render_thumbnails(img)
+
+
+def list_images(folder: str) -> List[str]:
+    files = []
+    for root, _, fnames in os.walk(folder):
+        for fn in fnames:
+            if allowed_ext(fn):
+                files.append(os.path.abspath(os.path.join(root, fn)))
+    files.sort()
+    return files
+
+
+def load_checkpoint(path: Optional[str]) -> Set[str]:
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def _append_checkpoint(path: Optional[str], src_paths: Iterable[str]) -> None:
+    if not path:
+        return
+    with open(path, "a", encoding="utf-8") as f:
+        for p in src_paths:
+            f.write(p + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _copy_into_store(src_path: str) -> Tuple[str, str]:
+    # Same naming as ingest_image_file: <uuid><ext> under DEFAULT_IMAGES_DIR, original bytes
+    ext = os.path.splitext(src_path)[1] or ".jpg"
+    if ext.lower() not in [".jpg", ".jpeg", ".png", ".bmp", ".webp"]:
+        ext = ".jpg"
+    ext_id = str(uuid.uuid4())
+    dst_path = os.path.join(DEFAULT_IMAGES_DIR, f"{ext_id}{ext}")
+    shutil.copyfile(src_path, dst_path)
+    return ext_id, dst_path
+
+
+def _store_batch(index: ImageVectorIndex, batch: List[Decoded]) -> None:
+    src_paths = [b[0] for b in batch]
+    image_vecs = embed_image_batch(torch.from_numpy(np.stack([b[3] for b in batch])))
+    captions = captions_from_pixel_values(torch.from_numpy(np.stack([b[4] for b in batch])))
+
+    # One batched text pass; the blend and caption vectors below are then cache hits
+    embed_texts([c for c in captions if c])
+
+    ext_ids, paths, vecs = [], [], []
+    for src_path, image_vec, caption, thumbnails in zip(src_paths, image_vecs, captions, [b[5] for b in batch]):
+        ext_id, dst_path = _copy_into_store(src_path)
+        write_thumbnails(dst_path, thumbnails)
+        ext_ids.append(ext_id)
+        paths.append(dst_path)
+        vecs.append(blend_with_captions(image_vec.astype(np.float32), caption, None)[0])
+
+    index.add(
+        ext_ids,
+        paths,
+        np.vstack(vecs).astype(np.float32),
+        captions=captions,
+        user_captions=[None] * len(ext_ids),
+        actives=[1] * len(ext_ids),
+        content_hashes=[b[1] for b in batch],
+        phashes=[b[2] for b in batch],
+    )
+
+
+def ingest_folder(
+    folder: str,
+    index: ImageVectorIndex,
+    batch_size: int = 16,
+    workers: Optional[int] = None,
+    checkpoint: Optional[str] = None,
+    progress: bool = False,
+) -> int:
+    """
+    Ingest every image under `folder` not already listed in `checkpoint`. Files whose
+    content is already stored (same sha256, or same dHash with DEDUP_PHASH=1) are skipped
+    before any inference.
+    Returns count of newly ingested images.
+    """
+    assert os.path.isdir(folder), f"Folder not found: {folder}"
+    os.makedirs(DEFAULT_IMAGES_DIR, exist_ok=True)
+
+    done = load_checkpoint(checkpoint)
+    files = [f for f in list_images(folder) if f not in done]
+    if not files:
+        return 0
+
+    _, preprocess, _, _ = get_model()
+    _, extractor, _ = _load_vitgpt2_captioner()
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+
+    ingested = 0
+    skipped: List[str] = []
+    batch: List[Decoded] = []
+    seen: Set[str] = set()
+    duplicates = 0
+    started = time.perf_counter()
+
+    def flush():
+        nonlocal batch, skipped, ingested
+        if batch:
+            _store_batch(index, batch)
+            ingested += len(batch)
+        _append_checkpoint(checkpoint, [b[0] for b in batch] + skipped)
+        batch, skipped = [], []
+        if progress:
+            rate = ingested / max(time.perf_counter() - started, 1e-9)
+            print(f"{ingested}/{len(files)} images  {rate:.2f} images/sec")
+
+    ctx = mp.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=(preprocess, extractor),
+    ) as pool:
+        for decoded in pool.map(_decode, files, chunksize=4):
+            src_path, content_hash, phash, clip_input = decoded[:4]
+            if clip_input is None:
+                print(f"skipping unreadable image: {src_path}")
+                skipped.append(src_path)
+                continue
+            if (
+                content_hash in seen
+                or (phash is not None and phash in seen)
+                or index.find_duplicate(content_hash=content_hash, phash=phash) is not None
+            ):
+                duplicates += 1
+                skipped.append(src_path)
+                continue
+            seen.add(content_hash)
+            if phash is not None:
+                seen.add(phash)
+            batch.append(decoded)
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+
+    elapsed = time.perf_counter() - started
+    if progress:
+        print(f"done: {ingested} images in {elapsed:.1f}s ({ingested / max(elapsed, 1e-9):.2f} images/sec), "
+              f"{duplicates} duplicates skipped")
+    return ingested
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Bulk-ingest a folder of images into the index.")
+    parser.add_argument("folder")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=None, help="decode processes (default: cores - 1)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="file of already ingested source paths")
+    args = parser.parse_args(argv)
+
+    index = create_index()
+    try:
+        ingest_folder(
+            args.folder,
+            index,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            checkpoint=args.checkpoint,
+            progress=True,
+        )
+    finally:
+        # Snapshot, so the next start does not replay the whole load from the vector log
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """
+    A small thread-safe LRU cache bounded by entry count and (optionally) total bytes.
+    sizeof(value) returns the byte size used for the memory bound.
+    With ttl (seconds) set, entries older than ttl are treated as missing.
+    """
+    def __init__(
+        self,
+        max_items: int = 1024,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+        ttl: Optional[float] = None,
+    ):
+        self.max_items = max(0, int(max_items))
+        self.max_bytes = int(max_bytes) if max_bytes else None
+        self.sizeof = sizeof or (lambda _v: 0)
+        self.ttl = float(ttl) if ttl else None
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._expires: Dict[Hashable, float] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _drop(self, key: Hashable) -> None:
+        del self._data[key]
+        self._bytes -= self._sizes.pop(key)
+        self._expires.pop(key, None)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                if self.ttl is not None and self._expires[key] <= time.monotonic():
+                    self._drop(key)
+                    self.expirations += 1
+                    self.misses += 1
+                    return default
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_items == 0:
+            return
+        size = int(self.sizeof(value))
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = value
+            self._sizes[key] = size
+            self._bytes += size
+            if self.ttl is not None:
+                self._expires[key] = time.monotonic() + self.ttl
+            while len(self._data) > self.max_items or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """
+        Drop every entry for which predicate(key, value) is true. Returns the number dropped.
+        """
+        with self._lock:
+            keys = [k for k, v in self._data.items() if predicate(k, v)]
+            for k in keys:
+                self._drop(k)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._expires.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_items": self.max_items,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "ttl": self.ttl,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
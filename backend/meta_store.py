@@ -0,0 +1,127 @@
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+def _vec_to_blob(vec: np.ndarray) -> bytes:
+    return np.ascontiguousarray(vec, dtype=np.float32).tobytes()
+
+
+def _blob_to_vec(blob: bytes, dim: int) -> Optional[np.ndarray]:
+    if not blob:
+        return None
+    vec = np.frombuffer(blob, dtype=np.float32)
+    return vec if vec.shape[0] == dim else None
+
+
+def select_rows(conn: sqlite3.Connection, since_version: Optional[int] = None) -> sqlite3.Cursor:
+    """
+    Cursor over the image rows MetaColumns mirrors, all of them or only those stamped with a
+    meta_version above since_version.
+    """
+    cols = "faiss_rowid, ext_id, path, caption, user_caption, is_active, caption_vec"
+    if since_version is None:
+        return conn.execute(f"SELECT {cols} FROM images ORDER BY faiss_rowid ASC")
+    return conn.execute(f"SELECT {cols} FROM images WHERE version > ? ORDER BY version ASC", (since_version,))
+
+
+class MetaColumns:
+    """
+    Image metadata held in memory as columns indexed by vector id (= faiss_rowid).
+    Slot 0 is unused because SQLite ids start at 1. SQLite stays the source of truth;
+    ImageVectorIndex writes through to it and mirrors every change here, so query-time
+    lookups are plain array indexing.
+    """
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.ext_ids: List[Optional[str]] = [None]
+        self.paths: List[Optional[str]] = [None]
+        self.captions: List[Optional[str]] = [None]
+        self.user_captions: List[Optional[str]] = [None]
+        self.is_active = np.zeros(1, dtype=bool)
+        # Normalized description vectors; zeros when there is no description
+        self.caption_vecs = np.zeros((1, dim), dtype=np.float32)
+        self.id_of: Dict[str, int] = {}
+
+    def _ensure(self, vec_id: int) -> None:
+        n = len(self.ext_ids)
+        if vec_id < n:
+            return
+        extra = max(vec_id + 1, 2 * n) - n
+        for col in (self.ext_ids, self.paths, self.captions, self.user_captions):
+            col.extend([None] * extra)
+        self.is_active = np.concatenate([self.is_active, np.zeros(extra, dtype=bool)])
+        self.caption_vecs = np.concatenate(
+            [self.caption_vecs, np.zeros((extra, self.dim), dtype=np.float32)]
+        )
+
+    def load(self, conn: sqlite3.Connection) -> List[Tuple[int, str]]:
+        """
+        Load every row. Returns (vec_id, description) for rows whose caption vector is
+        missing, so the caller can backfill them.
+        """
+        return self.load_rows(select_rows(conn))
+
+    def load_rows(self, rows: Iterable[tuple]) -> List[Tuple[int, str]]:
+        """
+        Apply rows as returned by select_rows (new rows are added, known ones overwritten);
+        returns the rows missing a caption vector, as load does.
+        """
+        missing: List[Tuple[int, str]] = []
+        for rowid, ext_id, path, caption, user_caption, is_active, blob in rows:
+            vec = _blob_to_vec(blob, self.dim)
+            self.set(rowid, ext_id, path, caption, user_caption, is_active, vec)
+            if vec is None and (user_caption or caption):
+                missing.append((rowid, user_caption or caption))
+        return missing
+
+    def set(
+        self,
+        vec_id: int,
+        ext_id: str,
+        path: str,
+        caption: Optional[str],
+        user_caption: Optional[str],
+        is_active,
+        caption_vec: Optional[np.ndarray],
+    ) -> None:
+        self._ensure(vec_id)
+        self.ext_ids[vec_id] = ext_id
+        self.paths[vec_id] = path
+        self.captions[vec_id] = caption
+        self.user_captions[vec_id] = user_caption
+        self.is_active[vec_id] = bool(1 if is_active is None else is_active)
+        self.caption_vecs[vec_id] = 0.0 if caption_vec is None else caption_vec
+        self.id_of[ext_id] = vec_id
+
+    def drop(self, vec_id: int) -> None:
+        if 0 < vec_id < len(self.ext_ids) and self.ext_ids[vec_id] is not None:
+            self.id_of.pop(self.ext_ids[vec_id], None)
+            self.ext_ids[vec_id] = self.paths[vec_id] = None
+            self.captions[vec_id] = self.user_captions[vec_id] = None
+            self.is_active[vec_id] = False
+            self.caption_vecs[vec_id] = 0.0
+
+    def lookup(self, ext_id: str) -> Optional[int]:
+        return self.id_of.get(ext_id)
+
+    def row(self, vec_id: int) -> Tuple[str, str, Optional[str], Optional[str], int]:
+        """
+        (ext_id, path, caption, user_caption, is_active) for a vector id.
+        """
+        if not 0 < vec_id < len(self.ext_ids) or self.ext_ids[vec_id] is None:
+            return "", "", None, None, 1
+        return (
+            self.ext_ids[vec_id],
+            self.paths[vec_id],
+            self.captions[vec_id],
+            self.user_captions[vec_id],
+            int(self.is_active[vec_id]),
+        )
+
+    def active_mask(self, size: int) -> np.ndarray:
+        out = np.zeros(size, dtype=bool)
+        n = min(size, self.is_active.shape[0])
+        out[:n] = self.is_active[:n]
+        return out
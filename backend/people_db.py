@@ -1,12 +1,29 @@
 import os
+import re
 import sqlite3
-from datetime import datetime
-from typing import Any, Dict, Optional, Tuple
+import threading
+import unicodedata
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
 
-from backend.faiss_index import DEFAULT_DATA_DIR  # reuse your data dir
+from backend.faiss_index import DEFAULT_DATA_DIR, _ensure_column  # reuse your data dir
+from backend.lru_cache import LRUCache
 
 DB_PATH = os.path.join(DEFAULT_DATA_DIR, "people.db")
 
+# One long-lived connection per thread (WAL, synchronous=NORMAL, memory-mapped reads, cached
+# statements). PEOPLE_DB_POOL=0 restores the old fresh-connection-per-call behaviour.
+PEOPLE_DB_POOL = os.environ.get("PEOPLE_DB_POOL", "1") != "0"
+PEOPLE_DB_MMAP_BYTES = int(os.environ.get("PEOPLE_DB_MMAP_BYTES", str(64 * 1024 * 1024)))
+PEOPLE_DB_CACHED_STATEMENTS = int(os.environ.get("PEOPLE_DB_CACHED_STATEMENTS", "256"))
+PEOPLE_DB_BUSY_TIMEOUT = float(os.environ.get("PEOPLE_DB_BUSY_TIMEOUT", "5"))
+
+# In-process cache of get_person / get_person_by_name results, written through on updates
+# (PEOPLE_CACHE_SIZE=0 disables it)
+PEOPLE_CACHE_SIZE = int(os.environ.get("PEOPLE_CACHE_SIZE", "4096"))
+PEOPLE_CACHE_MAX_BYTES = int(os.environ.get("PEOPLE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+PEOPLE_CACHE_TTL = float(os.environ.get("PEOPLE_CACHE_TTL", "300"))
+
 # Ensure data dir exists
 os.makedirs(DEFAULT_DATA_DIR, exist_ok=True)
 
@@ -28,14 +45,427 @@ CREATE TABLE IF NOT EXISTS people (
 APPENDABLE_FIELDS = {"memory_about", "last_conversation", "stories_for", "questions_for"}
 SETTABLE_FIELDS = {"first_name", "last_name", "relation", "age"}.union(APPENDABLE_FIELDS)
 
+# Growing fields are stored as rows in person_events instead of a TEXT blob that every
+# append rewrites. op: 'append' (an entry), 'set' (memory_about replaced; earlier entries no
+# longer count), 'raw' (migrated text that had no timestamp). The old blob is rebuilt by
+# render_events.
+EVENT_FIELDS = ("memory_about", "stories_for", "questions_for")
+# Entries of these fields are rendered "[<created_at>]\n<text>"; memory_about is plain text
+STAMPED_FIELDS = {"stories_for", "questions_for"}
+
+EVENTS_SQL = """
+CREATE TABLE IF NOT EXISTS person_events (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    phone_number TEXT NOT NULL,
+    field        TEXT NOT NULL,
+    op           TEXT NOT NULL DEFAULT 'append',
+    text         TEXT NOT NULL,
+    created_at   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_person_events_field ON person_events(phone_number, field, id);
+"""
+
+# Bumped by every write; processes compare it with the version their caches were filled at
+VERSION_SQL = """
+CREATE TABLE IF NOT EXISTS people_version (
+    id      INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO people_version (id, version) VALUES (1, 0);
+"""
+
+# memory_about counts from its latest 'set' (params: phone_number, field)
+_SINCE_LAST_SET_SQL = (
+    "id >= (SELECT COALESCE(MAX(id), 0) FROM person_events "
+    "WHERE phone_number = ? AND field = ? AND op = 'set')"
+)
+
+# A stamp as written by the old appends: at the start of the blob or after a newline
+_STAMP_RE = re.compile(r"(?:^|\n)\[(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z)\]\n")
+
+# Case-folded, unaccented copies of the names, kept in step by create_or_update_person.
+# Exact lookups use the composite index; substring lookups use the trigram FTS5 table,
+# which triggers keep in sync with people.
+NAME_COLUMNS = {"first_name": "first_name_norm", "last_name": "last_name_norm"}
+INTERNAL_COLUMNS = set(NAME_COLUMNS.values())
+
+NAME_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_people_name_norm
+    ON people(first_name_norm, last_name_norm, updated_at);
+"""
+
+NAME_FTS_SQL = """
+CREATE VIRTUAL TABLE people_names_fts USING fts5(
+    first_name_norm, last_name_norm,
+    content='people', content_rowid='rowid', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS people_names_ai AFTER INSERT ON people BEGIN
+    INSERT INTO people_names_fts(rowid, first_name_norm, last_name_norm)
+    VALUES (new.rowid, new.first_name_norm, new.last_name_norm);
+END;
+CREATE TRIGGER IF NOT EXISTS people_names_ad AFTER DELETE ON people BEGIN
+    INSERT INTO people_names_fts(people_names_fts, rowid, first_name_norm, last_name_norm)
+    VALUES ('delete', old.rowid, old.first_name_norm, old.last_name_norm);
+END;
+CREATE TRIGGER IF NOT EXISTS people_names_au AFTER UPDATE OF first_name_norm, last_name_norm ON people BEGIN
+    INSERT INTO people_names_fts(people_names_fts, rowid, first_name_norm, last_name_norm)
+    VALUES ('delete', old.rowid, old.first_name_norm, old.last_name_norm);
+    INSERT INTO people_names_fts(rowid, first_name_norm, last_name_norm)
+    VALUES (new.rowid, new.first_name_norm, new.last_name_norm);
+END;
+"""
+
+# Trigram queries need at least 3 characters; shorter terms are matched with instr()
+TRIGRAM_MIN_CHARS = 3
+
+# None until checked: SQLite builds without FTS5 / the trigram tokenizer fall back to a scan
+_name_fts = None
+
+_local = threading.local()
+
+def _profile_bytes(person: Optional[Dict[str, Any]]) -> int:
+    # Rough size for the cache's memory bound: text length of every value
+    if not person:
+        return 0
+    size = 0
+    for v in person.values():
+        if isinstance(v, list):
+            size += sum(len(e["text"]) + 32 for e in v)
+        elif v is not None:
+            size += len(str(v))
+    return size
+
+# Profiles keyed (epoch, phone, version, limit, since): a write bumps the person's version, so
+# a profile read before it is never served after it, even when a slow reader stores it late.
+# Name lookups keyed (epoch, first, last) -> phone ("" when nobody matches): a write drops the
+# lookups it could change. A commit from another process bumps the epoch. Stale keys age out
+# of the LRU.
+person_cache = LRUCache(max_items=PEOPLE_CACHE_SIZE, max_bytes=PEOPLE_CACHE_MAX_BYTES,
+                        sizeof=_profile_bytes, ttl=PEOPLE_CACHE_TTL)
+name_cache = LRUCache(max_items=PEOPLE_CACHE_SIZE, ttl=PEOPLE_CACHE_TTL)
+_cache_lock = threading.Lock()
+_person_versions: Dict[str, int] = {}
+_cache_epoch = 0
+_name_writes = 0
+# people_version as of the cache contents; every write bumps it (see create_or_update_person).
+# Versions committed by this process's own writes (already written through) may finish out
+# of order; they are kept here until _seen_version catches up to them.
+_seen_version = -1
+_own_versions = set()
+_resyncs = 0
+_MISSING = object()
+
+def _open() -> sqlite3.Connection:
+    con = sqlite3.connect(
+        DB_PATH,
+        timeout=PEOPLE_DB_BUSY_TIMEOUT,
+        check_same_thread=False,
+        cached_statements=PEOPLE_DB_CACHED_STATEMENTS,
+    )
+    con.row_factory = sqlite3.Row
+    # WAL: readers no longer wait for a writer; NORMAL is durable across app crashes and
+    # only loses the last commits on power loss
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute(f"PRAGMA mmap_size={PEOPLE_DB_MMAP_BYTES}")
+    return con
+
 def _connect() -> sqlite3.Connection:
-    # Create a fresh connection per call (safe for threaded Flask)
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+    """
+    This thread's connection, opened on first use. Use as `with _connect() as con:`, which
+    commits or rolls back but keeps the connection open.
+    """
+    if not PEOPLE_DB_POOL:
+        # Legacy: a fresh connection per call, default rollback journal
+        con = sqlite3.connect(DB_PATH, check_same_thread=False)
+        con.row_factory = sqlite3.Row
+        return con
+    con = getattr(_local, "con", None)
+    # A connection opened before fork (gunicorn --preload) belongs to the parent; never reuse it
+    if con is None or _local.pid != os.getpid() or _local.path != DB_PATH:
+        con = _open()
+        _local.con, _local.pid, _local.path = con, os.getpid(), DB_PATH
+    return con
+
+def _db_version(con: sqlite3.Connection) -> int:
+    return con.execute("SELECT version FROM people_version WHERE id = 1").fetchone()[0]
+
+def _advance_seen_version() -> None:
+    # Caller holds _cache_lock
+    global _seen_version
+    while _seen_version + 1 in _own_versions:
+        _own_versions.remove(_seen_version + 1)
+        _seen_version += 1
+
+def _drop_caches(version: int) -> None:
+    # Caller holds _cache_lock
+    global _cache_epoch, _seen_version, _resyncs
+    _cache_epoch += 1
+    _resyncs += 1
+    _seen_version = version
+    _own_versions.difference_update([v for v in _own_versions if v <= version])
+    person_cache.clear()
+    name_cache.clear()
+
+def _sync_cache(con: sqlite3.Connection) -> None:
+    """
+    Drop the caches if people.db changed behind this process's back: another process (e.g.
+    a different gunicorn worker handling /set_info) bumped people_version. One primary-key
+    read of a hot page per lookup.
+    """
+    version = _db_version(con)
+    if version != _seen_version:
+        with _cache_lock:
+            _advance_seen_version()
+            if version != _seen_version:
+                _drop_caches(version)
+
+def _cached_person(
+    con: sqlite3.Connection,
+    phone: str,
+    limit: Optional[int],
+    since: Optional[str],
+    row: Optional[sqlite3.Row] = None,
+) -> Optional[Dict[str, Any]]:
+    key = (_cache_epoch, phone, _person_versions.get(phone, 0), limit, since)
+    person = person_cache.get(key, _MISSING)
+    if person is _MISSING:
+        if row is None:
+            row = con.execute("SELECT * FROM people WHERE phone_number = ?", (phone,)).fetchone()
+        person = _with_events(con, row, limit, since) if row else None
+        person_cache.put(key, person)
+    # Callers get their own dict; the cached one is shared
+    return dict(person) if person else None
+
+def _write_through(
+    phone: str,
+    person: Dict[str, Any],
+    limit: Optional[int],
+    since: Optional[str],
+    db_version: int,
+) -> None:
+    """
+    db_version: people_version before this write, which bumped it by one.
+    """
+    global _name_writes
+    first, last = fold_name(person.get("first_name")) or "", fold_name(person.get("last_name")) or ""
+    with _cache_lock:
+        if db_version + 1 > _seen_version:
+            _own_versions.add(db_version + 1)
+            _advance_seen_version()
+        version = _person_versions.get(phone, 0) + 1
+        _person_versions[phone] = version
+        # A lookup can now give a different answer if it returned this person (names may have
+        # changed) or if this person matches it (its updated_at now wins ties)
+        _name_writes += 1
+        name_cache.invalidate_where(lambda k, v: v == phone or (k[1] in first and k[2] in last))
+        key = (_cache_epoch, phone, version, limit, since)
+    person_cache.put(key, dict(person))
+
+def person_cache_stats() -> Dict[str, Any]:
+    return {
+        "profiles": person_cache.stats(),
+        "names": name_cache.stats(),
+        "resyncs": _resyncs,
+    }
+
+def close_connection() -> None:
+    """
+    Close this thread's pooled connection, if any.
+    """
+    con = getattr(_local, "con", None)
+    if con is not None and _local.pid == os.getpid():
+        con.close()
+    _local.con = None
 
 def init_db() -> None:
+    global _name_fts
     with _connect() as con:
         con.execute(SCHEMA_SQL)
+        cur = con.cursor()
+        for col in NAME_COLUMNS.values():
+            _ensure_column(cur, "people", col, "TEXT")
+        _backfill_name_columns(con)
+        # Rows written before updated_at was always canonical: rewrite them in the same
+        # fixed-width ISO form, so ordering on the raw column matches ordering by time
+        con.execute(
+            """UPDATE people SET updated_at = COALESCE(strftime('%Y-%m-%dT%H:%M:%SZ', updated_at), updated_at)
+               WHERE updated_at IS NOT NULL
+                 AND updated_at NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]T[0-9][0-9]:[0-9][0-9]:[0-9][0-9]Z'"""
+        )
+        con.execute(NAME_INDEX_SQL)
+        con.executescript(EVENTS_SQL)
+        _migrate_event_blobs(con)
+        con.executescript(VERSION_SQL)
+        # Migrations above may have changed rows other processes have cached
+        con.execute("UPDATE people_version SET version = version + 1 WHERE id = 1")
         con.commit()
+        _name_fts = _init_name_fts(con)
+        with _cache_lock:
+            _drop_caches(_db_version(con))
+
+def _blob_to_events(field: str, blob: str, created_at: str) -> List[Tuple[str, str, str]]:
+    """
+    Split an old appended blob into (op, text, created_at) events that render back to the
+    same text. Timestamped entries keep their stamp as created_at.
+    """
+    if field not in STAMPED_FIELDS:
+        return [("set", blob, created_at)]
+    matches = list(_STAMP_RE.finditer(blob))
+    if not matches:
+        return [("raw", blob, created_at)]
+    events = []
+    if matches[0].start() > 0 or matches[0].group(0).startswith("\n"):
+        events.append(("raw", blob[:matches[0].start()], created_at))
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(blob)
+        events.append(("append", blob[m.end():end], m.group(1)))
+    return events
+
+def _migrate_event_blobs(con: sqlite3.Connection) -> None:
+    """
+    Move memory_about / stories_for / questions_for text still stored on people rows into
+    person_events, then clear the columns. Runs inside init_db; a no-op once done.
+    """
+    cols = ", ".join(EVENT_FIELDS)
+    where = " OR ".join(f"{f} IS NOT NULL" for f in EVENT_FIELDS)
+    rows = con.execute(f"SELECT phone_number, updated_at, {cols} FROM people WHERE {where}").fetchall()
+    for row in rows:
+        phone, created_at = row[0], row[1] or _now_iso()
+        for field, blob in zip(EVENT_FIELDS, row[2:]):
+            if blob is None:
+                continue
+            con.executemany(
+                "INSERT INTO person_events (phone_number, field, op, text, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(phone, field, op, text, ts) for op, text, ts in _blob_to_events(field, blob, created_at)],
+            )
+    if rows:
+        con.execute(f"UPDATE people SET {', '.join(f'{f} = NULL' for f in EVENT_FIELDS)} WHERE {where}")
+        print(f"people.db: moved appended fields of {len(rows)} people into person_events")
+
+def _backfill_name_columns(con: sqlite3.Connection) -> None:
+    rows = con.execute(
+        """SELECT rowid, first_name, last_name FROM people
+           WHERE (first_name IS NOT NULL AND first_name_norm IS NULL)
+              OR (last_name IS NOT NULL AND last_name_norm IS NULL)"""
+    ).fetchall()
+    con.executemany(
+        "UPDATE people SET first_name_norm = ?, last_name_norm = ? WHERE rowid = ?",
+        [(fold_name(r[1]), fold_name(r[2]), r[0]) for r in rows],
+    )
+
+def _init_name_fts(con: sqlite3.Connection) -> bool:
+    """
+    Create the trigram table and its triggers on first run, indexing the existing rows.
+    Returns False if this SQLite has no FTS5 trigram tokenizer.
+    """
+    exists = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'people_names_fts'"
+    ).fetchone()
+    if exists:
+        return True
+    try:
+        con.executescript(NAME_FTS_SQL)
+    except sqlite3.OperationalError as e:
+        print(f"people.db: no FTS5 trigram support ({e}); name substring lookups will scan")
+        return False
+    con.execute("INSERT INTO people_names_fts(people_names_fts) VALUES ('rebuild')")
+    con.commit()
+    return True
+
+def _has_name_fts(con: sqlite3.Connection) -> bool:
+    global _name_fts
+    if _name_fts is None:
+        _name_fts = con.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'people_names_fts'"
+        ).fetchone() is not None
+    return _name_fts
+
+def fold_name(name: Optional[str]) -> Optional[str]:
+    """
+    Case-folded, accent-free form of a name with whitespace collapsed: "  José  Díaz" -> "jose diaz".
+    """
+    if name is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", str(name))
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+def _person_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    return {k: row[k] for k in row.keys() if k not in INTERNAL_COLUMNS}
+
+def get_events(
+    con: sqlite3.Connection,
+    phone: str,
+    field: str,
+    limit: Optional[int] = None,
+    since: Optional[str] = None,
+) -> List[sqlite3.Row]:
+    """
+    Current events of one field, oldest first: the last `limit` of them, only those created
+    at or after `since` (canonical ISO timestamp) when given.
+    """
+    where, params = ["phone_number = ?", "field = ?"], [phone, field]
+    if field == "memory_about":
+        where.append(_SINCE_LAST_SET_SQL)
+        params += [phone, field]
+    if since is not None:
+        where.append("created_at >= ?")
+        params.append(since)
+    sql = f"SELECT op, text, created_at FROM person_events WHERE {' AND '.join(where)} ORDER BY id DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    rows = con.execute(sql, params).fetchall()
+    rows.reverse()
+    return rows
+
+def render_events(field: str, events: List[sqlite3.Row]) -> Optional[str]:
+    """
+    The concatenated text older clients got for a field; None if it has no events.
+    """
+    if not events:
+        return None
+    parts = []
+    for e in events:
+        if field in STAMPED_FIELDS and e["op"] == "append":
+            parts.append(f"[{e['created_at']}]\n{e['text']}")
+        else:
+            parts.append(e["text"])
+    return "\n".join(parts)
+
+def _with_events(
+    con: sqlite3.Connection,
+    row: sqlite3.Row,
+    limit: Optional[int] = None,
+    since: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Person dict with its event fields filled in. Without limit/since each field is the full
+    concatenated text (the old format); with either, a list of {"text", "created_at"}.
+    """
+    person = _person_dict(row)
+    for field in EVENT_FIELDS:
+        if limit is None and since is None:
+            person[field] = render_events(field, get_events(con, person["phone_number"], field))
+        else:
+            events = get_events(con, person["phone_number"], field, limit=limit, since=since)
+            person[field] = [{"text": e["text"], "created_at": e["created_at"]} for e in events]
+    return person
+
+def _add_event(con: sqlite3.Connection, phone: str, field: str, text: str, op: str, created_at: str) -> None:
+    con.execute(
+        "INSERT INTO person_events (phone_number, field, op, text, created_at) VALUES (?, ?, ?, ?, ?)",
+        (phone, field, op, text, created_at),
+    )
+
+def _memory_length(con: sqlite3.Connection, phone: str) -> int:
+    # Length of the current memory_about text, computed in SQLite without building it
+    return con.execute(
+        "SELECT COALESCE(SUM(length(text)), 0) + MAX(COUNT(*) - 1, 0) FROM person_events "
+        "WHERE phone_number = ? AND field = 'memory_about' AND " + _SINCE_LAST_SET_SQL,
+        (phone, phone, "memory_about"),
+    ).fetchone()[0]
 
 def normalize_phone(p: str) -> str:
     # Keep + and digits; you can adjust to your needs
@@ -54,15 +484,28 @@ def append_text(existing: Optional[str], addition: str) -> str:
 def _now_iso() -> str:
     return datetime.utcnow().isoformat(timespec="seconds") + "Z"
 
-def get_person(phone_number: str) -> Optional[Dict[str, Any]]:
+def parse_since(value: str) -> Optional[str]:
+    """
+    "2025-03-01", "2025-03-01T10:00:00" or "...Z" -> canonical "2025-03-01T10:00:00Z" (UTC),
+    comparable with created_at. None if it does not parse.
+    """
+    try:
+        ts = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def get_person(phone_number: str, limit: Optional[int] = None, since: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    limit / since select the recent memory_about, stories_for and questions_for entries
+    (see _with_events); without them those fields are the full concatenated text.
+    """
     phone = normalize_phone(phone_number)
     with _connect() as con:
-        con.row_factory = sqlite3.Row
-        row = con.execute(
-            "SELECT * FROM people WHERE phone_number = ?",
-            (phone,),
-        ).fetchone()
-        return dict(row) if row else None
+        _sync_cache(con)
+        return _cached_person(con, phone, limit, since)
 
 def _insert_empty_person(con: sqlite3.Connection, phone: str) -> None:
     con.execute(
@@ -71,7 +514,12 @@ def _insert_empty_person(con: sqlite3.Connection, phone: str) -> None:
         (phone, _now_iso()),
     )
 
-def create_or_update_person(phone_number: str, payload: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+def create_or_update_person(
+    phone_number: str,
+    payload: Dict[str, Any],
+    limit: Optional[int] = None,
+    since: Optional[str] = None,
+) -> Tuple[str, Dict[str, Any]]:
     """
     - If person exists: append or set fields based on rules
     - If not: create person, then apply same logic
@@ -80,6 +528,9 @@ def create_or_update_person(phone_number: str, payload: Dict[str, Any]) -> Tuple
       * last_conversation: ALWAYS overwrite (do not append)
       * memory_about: If new text is longer than existing -> overwrite,
                       else append (concatenate with a newline)
+    memory_about, stories_for and questions_for are written as person_events rows (one
+    INSERT each), never by rewriting the accumulated text. limit / since shape the returned
+    person as for get_person.
     Returns (action, person_dict) where action is "created" or "updated"
     """
     phone = normalize_phone(phone_number)
@@ -97,7 +548,10 @@ def create_or_update_person(phone_number: str, payload: Dict[str, Any]) -> Tuple
             updates.pop("age", None)
 
     with _connect() as con:
-        con.row_factory = sqlite3.Row
+        # Take the write lock before reading, so concurrent appends to the same person
+        # cannot both start from the same old text
+        con.execute("BEGIN IMMEDIATE")
+        db_version = _db_version(con)
         existing = con.execute(
             "SELECT * FROM people WHERE phone_number = ?", (phone,)
         ).fetchone()
@@ -115,7 +569,9 @@ def create_or_update_person(phone_number: str, payload: Dict[str, Any]) -> Tuple
                 return "\n".join(f"- {str(x)}" for x in val)
             return "" if val is None else str(val)
 
+        now = _now_iso()
         new_values: Dict[str, Any] = {}
+        events: List[Tuple[str, str, str]] = []
         for field, value in updates.items():
             # --- Special-case rules first ---
             if field == "last_conversation":
@@ -126,27 +582,35 @@ def create_or_update_person(phone_number: str, payload: Dict[str, Any]) -> Tuple
             if field == "memory_about":
                 # Overwrite if new longer than old; else append
                 new_text = _to_text(value)
-                old_text = existing_dict.get("memory_about") or ""
-                if len(new_text) >= len(old_text):
-                    new_values[field] = new_text
-                else:
+                if len(new_text) >= _memory_length(con, phone):
+                    events.append((field, new_text, "set"))
+                elif new_text:
                     # append without timestamp per requirement to "just concatenate"
-                    new_values[field] = append_text(old_text, new_text)
+                    events.append((field, new_text, "append"))
                 continue
 
             # --- Default behavior ---
             if field in APPENDABLE_FIELDS:
                 # For other appendable fields (e.g., stories_for, questions_for),
-                # keep the original timestamped-append behavior.
-                stamped = f"[{_now_iso()}]\n{_to_text(value)}"
-                new_values[field] = append_text(existing_dict.get(field), stamped)
+                # keep the original timestamped-append behavior; the stamp is created_at.
+                events.append((field, _to_text(value), "append"))
             else:
                 # set/overwrite (first_name, last_name, relation, age)
                 new_values[field] = value
 
+        # Keep the folded names in step; only when they change, so the FTS trigger stays idle
+        for field, norm_col in NAME_COLUMNS.items():
+            if field in new_values:
+                folded = fold_name(new_values[field])
+                if folded != existing_dict.get(norm_col):
+                    new_values[norm_col] = folded
+
         # Always bump updated_at
-        new_values["updated_at"] = _now_iso()
+        new_values["updated_at"] = now
 
+        for field, text, op in events:
+            _add_event(con, phone, field, text, op, now)
+        con.execute("UPDATE people_version SET version = version + 1 WHERE id = 1")
         if new_values:
             assignments = ", ".join(f"{k} = ?" for k in new_values.keys())
             params = list(new_values.values()) + [phone]
@@ -156,48 +620,85 @@ def create_or_update_person(phone_number: str, payload: Dict[str, Any]) -> Tuple
         person = con.execute(
             "SELECT * FROM people WHERE phone_number = ?", (phone,)
         ).fetchone()
-        return action, dict(person)
+        person = _with_events(con, person, limit, since)
+    _write_through(phone, person, limit, since, db_version)
+    return action, person
 
 
-def _escape_like(s: str) -> str:
-    return s.replace("%", r"\%").replace("_", r"\_")
-
-def get_person_by_name(first_name: str, last_name: str) -> Optional[Dict[str, Any]]:
+def get_person_by_name(
+    first_name: str,
+    last_name: str,
+    limit: Optional[int] = None,
+    since: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
     """
     Look up a person by name, returning the first one.
+    Names are compared case-folded and without accents. An exact match on both names wins;
+    otherwise both given names are matched as substrings. Ties go to the most recently
+    updated person. limit / since as for get_person.
     Returns a dict or None.
     """
     fn = (first_name or "").strip()
     ln = (last_name or "").strip()
     if not fn or not ln:
         return None
+    fn_fold, ln_fold = fold_name(fn), fold_name(ln)
 
     with _connect() as con:
-        con.row_factory = sqlite3.Row
+        _sync_cache(con)
+        name_key = (_cache_epoch, fn_fold, ln_fold)
+        phone = name_cache.get(name_key, _MISSING)
+        row = None
+        if phone is _MISSING:
+            writes_before = _name_writes
+            row = _find_by_name(con, fn_fold, ln_fold)
+            phone = row["phone_number"] if row else ""
+            with _cache_lock:
+                # A write in between may already have dropped this key; do not store over it
+                if _name_writes == writes_before:
+                    name_cache.put(name_key, phone)
+        if not phone:
+            return None
+        return _cached_person(con, phone, limit, since, row)
+
+
+def _find_by_name(con: sqlite3.Connection, fn_fold: str, ln_fold: str) -> Optional[sqlite3.Row]:
+    """
+    Exact match on both folded names, else substring match on both; most recent first.
+    """
+    row = con.execute(
+        """
+        SELECT * FROM people
+        WHERE first_name_norm = ? AND last_name_norm = ?
+        ORDER BY updated_at DESC
+        LIMIT 1
+        """,
+        (fn_fold, ln_fold),
+    ).fetchone()
+    if row:
+        return row
 
+    terms = [("first_name_norm", fn_fold), ("last_name_norm", ln_fold)]
+    indexed = [(col, t) for col, t in terms if len(t) >= TRIGRAM_MIN_CHARS]
+    if indexed and _has_name_fts(con):
+        # Trigram phrase match = substring match; terms too short for it are checked on the row
+        match = " AND ".join(f'{col} : "{t.replace(chr(34), chr(34) * 2)}"' for col, t in indexed)
+        short = [(col, t) for col, t in terms if len(t) < TRIGRAM_MIN_CHARS]
         row = con.execute(
-            """
-            SELECT * FROM people
-            WHERE lower(first_name) = lower(?)
-              AND lower(last_name)  = lower(?)
-            ORDER BY datetime(updated_at) DESC
-            LIMIT 1
-            """,
-            (fn, ln),
+            "SELECT p.* FROM people_names_fts f JOIN people p ON p.rowid = f.rowid "
+            "WHERE people_names_fts MATCH ?"
+            + "".join(f" AND instr(p.{col}, ?) > 0" for col, _ in short)
+            + " ORDER BY p.updated_at DESC LIMIT 1",
+            [match] + [t for _, t in short],
         ).fetchone()
-        if row:
-            return dict(row)
-
-        fn_like = f"%{_escape_like(fn)}%"
-        ln_like = f"%{_escape_like(ln)}%"
+    else:
         row = con.execute(
-            r"""
+            """
             SELECT * FROM people
-            WHERE lower(first_name) LIKE lower(?) ESCAPE '\'
-              AND lower(last_name)  LIKE lower(?) ESCAPE '\'
-            ORDER BY datetime(updated_at) DESC
+            WHERE instr(first_name_norm, ?) > 0 AND instr(last_name_norm, ?) > 0
+            ORDER BY updated_at DESC
             LIMIT 1
             """,
-            (fn_like, ln_like),
+            (fn_fold, ln_fold),
         ).fetchone()
-        return dict(row) if row else None
\ No newline at end of file
+    return row
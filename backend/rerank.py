@@ -0,0 +1,105 @@
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MINIMUM_SCORE = 0.25
+HIGH_SCORE_THRESHOLD = 0.6  # used to adapt minimum score per-query
+
+# combined = image score * WEIGHT_IMAGE + description score * (user or auto caption weight)
+WEIGHT_IMAGE = 0.8
+WEIGHT_AUTO_CAPTION = 0.2
+WEIGHT_USER_CAPTION = 0.35
+
+# Hit tuples as returned by ImageVectorIndex.search: (ext_id, path, score, caption, user_caption, is_active)
+Hit = Tuple[str, str, float, Optional[str], Optional[str], int]
+
+
+def _hit_arrays(results: Sequence[Sequence[Hit]], k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (N, k) FAISS scores, user-caption flags and validity mask; missing slots are invalid.
+    """
+    n = len(results)
+    scores = np.zeros((n, k), dtype=np.float32)
+    has_user = np.zeros((n, k), dtype=bool)
+    valid = np.zeros((n, k), dtype=bool)
+    for qi, hits in enumerate(results):
+        m = len(hits)
+        if m:
+            scores[qi, :m] = [h[2] for h in hits]
+            has_user[qi, :m] = [bool(h[4]) for h in hits]
+            valid[qi, :m] = [bool(h[5]) for h in hits]
+    return scores, has_user, valid
+
+
+def combined_scores(
+    faiss_scores: np.ndarray,
+    caption_vecs: np.ndarray,
+    queries: np.ndarray,
+    has_user_caption: np.ndarray,
+) -> np.ndarray:
+    """
+    faiss_scores (N, k), caption_vecs (N, k, D) normalized (zeros when there is no
+    description), queries (N, D), has_user_caption (N, k) -> combined scores (N, k).
+    """
+    qnorm = queries / (np.sqrt(np.einsum("nd,nd->n", queries, queries))[:, None] + 1e-12)
+    desc_scores = np.matmul(caption_vecs, qnorm.astype(np.float32)[:, :, None])[:, :, 0]
+    desc_weights = np.where(has_user_caption, WEIGHT_USER_CAPTION, WEIGHT_AUTO_CAPTION)
+    return faiss_scores * WEIGHT_IMAGE + desc_scores * desc_weights
+
+
+def adaptive_minimum(combined: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """
+    Per-query minimum score: a fraction of the best score, never below MINIMUM_SCORE.
+    """
+    top = np.max(combined, axis=1, where=valid, initial=-np.inf)
+    factor = np.where(top >= HIGH_SCORE_THRESHOLD, 0.6, 0.7)
+    return np.maximum(MINIMUM_SCORE, top * factor)
+
+
+def rerank_batch(
+    results: Sequence[Sequence[Hit]],
+    caption_vecs: np.ndarray,
+    queries: np.ndarray,
+    keep_best: bool = False,
+) -> List[List[Tuple[int, float]]]:
+    """
+    Re-rank the hits of N queries.
+    results[q] are the hits of query q, caption_vecs is (N, k, D) aligned with them and
+    queries is (N, D). Returns, per query, (hit position, combined score) pairs that pass the
+    adaptive minimum, best first. With keep_best=True a query whose hits are all below the
+    minimum keeps its single best hit.
+    """
+    queries = np.asarray(queries, dtype=np.float32).reshape(len(results), -1)
+    k = caption_vecs.shape[1] if caption_vecs.ndim == 3 else 0
+    scores, has_user, valid = _hit_arrays(results, k)
+    if k == 0:
+        return [[] for _ in results]
+
+    combined = combined_scores(scores, caption_vecs, queries, has_user)
+    ranked = np.where(valid, combined, -np.inf)
+    keep = ranked >= adaptive_minimum(combined, valid)[:, None]
+    order = np.argsort(-ranked, axis=1, kind="stable")
+
+    out = []
+    for qi in range(len(results)):
+        row = order[qi]
+        kept = row[keep[qi, row]]
+        if kept.size == 0 and keep_best and valid[qi].any():
+            kept = row[:1]
+        out.append(list(zip(kept.tolist(), combined[qi, kept].tolist())))
+    return out
+
+
+def rerank(
+    results: Sequence[Hit],
+    caption_vecs: np.ndarray,
+    query: np.ndarray,
+    keep_best: bool = False,
+) -> List[Tuple[int, float]]:
+    """
+    Single-query rerank_batch; caption_vecs is (len(results), D).
+    """
+    if not results:
+        return []
+    caption_vecs = np.asarray(caption_vecs, dtype=np.float32).reshape(1, len(results), -1)
+    return rerank_batch([results], caption_vecs, np.asarray(query)[None, :], keep_best=keep_best)[0]
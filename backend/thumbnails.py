@@ -0,0 +1,151 @@
+"""
+Fixed-size thumbnails of stored images, served from
+/data/thumbs/<size>/<image id>.r<revision>q<quality>.<ext>.
+
+Ingest writes them from the image it has already decoded; images stored before that are
+covered by the backfill command:
+
+    python -m backend.thumbnails backfill [--force] [--workers 4]
+
+THUMB_SIZES lists the shorter-side lengths in pixels (default "160,320": 1x and 2x of the
+140px tiles on /manage-images). THUMB_FORMAT is webp (default) or jpeg.
+
+/data serves thumbnails as immutable, so a URL must never get new content: the file name
+carries everything that changes the output (size, format, quality and THUMB_REVISION).
+Bump THUMB_REVISION when render_thumbnails changes; backfill then writes new files.
+"""
+import argparse
+import glob
+import io
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from backend.faiss_index import DEFAULT_DATA_DIR, DEFAULT_META_DB
+
+THUMBS_DIR = os.path.join(DEFAULT_DATA_DIR, "thumbs")
+THUMB_SIZES = sorted(int(s) for s in os.environ.get("THUMB_SIZES", "160,320").split(",") if s.strip())
+THUMB_FORMAT = os.environ.get("THUMB_FORMAT", "webp").lower()
+THUMB_QUALITY = int(os.environ.get("THUMB_QUALITY", "80"))
+
+if THUMB_FORMAT not in ("webp", "jpeg"):
+    raise ValueError(f"THUMB_FORMAT must be webp or jpeg, got {THUMB_FORMAT!r}")
+THUMB_EXT = ".webp" if THUMB_FORMAT == "webp" else ".jpg"
+THUMB_REVISION = 1
+
+
+def _stem(image_path: str) -> str:
+    return os.path.splitext(os.path.basename(image_path.replace("\\", "/")))[0]
+
+
+def thumbnail_path(image_path: str, size: int) -> str:
+    name = f"{_stem(image_path)}.r{THUMB_REVISION}q{THUMB_QUALITY}{THUMB_EXT}"
+    return os.path.join(THUMBS_DIR, str(size), name)
+
+
+def existing_thumbnails(image_path: str) -> Dict[int, str]:
+    """
+    {size: path} of the thumbnails of image_path that are on disk.
+    """
+    out = {}
+    for size in THUMB_SIZES:
+        p = thumbnail_path(image_path, size)
+        if os.path.isfile(p):
+            out[size] = p
+    return out
+
+
+def render_thumbnails(img: Image.Image) -> Dict[int, bytes]:
+    """
+    Encode one thumbnail per THUMB_SIZES entry; the shorter side is scaled down to the size
+    (never up). EXIF orientation is applied, so thumbnails display like the original.
+    Sizes are rendered largest first, each from the previous one.
+    """
+    img = ImageOps.exif_transpose(img).convert("RGB")
+    out = {}
+    for size in reversed(THUMB_SIZES):
+        w, h = img.size
+        if min(w, h) > size:
+            scale = size / float(min(w, h))
+            img = img.resize((max(1, round(w * scale)), max(1, round(h * scale))), Image.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, format=THUMB_FORMAT.upper(), quality=THUMB_QUALITY)
+        out[size] = buf.getvalue()
+    return out
+
+
+def write_thumbnails(image_path: str, rendered: Dict[int, bytes]) -> None:
+    for size, data in rendered.items():
+        p = thumbnail_path(image_path, size)
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        tmp = p + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        # Atomic: /data never serves a half-written thumbnail
+        os.replace(tmp, p)
+
+
+def save_thumbnails(img: Image.Image, image_path: str) -> None:
+    write_thumbnails(image_path, render_thumbnails(img))
+
+
+def remove_thumbnails(image_path: str) -> None:
+    """
+    Remove every thumbnail of image_path, including ones written with other settings.
+    """
+    for p in glob.glob(os.path.join(THUMBS_DIR, "*", glob.escape(_stem(image_path)) + ".*")):
+        try:
+            os.remove(p)
+        except OSError:
+            pass
+
+
+def _backfill_one(image_path: str) -> Tuple[str, Optional[str]]:
+    from backend.embedding import load_rgb
+
+    try:
+        # Decode just large enough for the biggest thumbnail
+        save_thumbnails(load_rgb(image_path, min_side=THUMB_SIZES[-1]), image_path)
+        return image_path, None
+    except Exception as e:
+        return image_path, str(e)
+
+
+def cmd_backfill(args) -> None:
+    conn = sqlite3.connect(args.meta_db)
+    paths = [r[0] for r in conn.execute("SELECT path FROM images ORDER BY faiss_rowid")]
+    conn.close()
+    todo = [
+        p for p in paths
+        if os.path.isfile(p) and (args.force or len(existing_thumbnails(p)) < len(THUMB_SIZES))
+    ]
+    print(f"{len(todo)} of {len(paths)} images need thumbnails ({THUMB_FORMAT}, sizes {THUMB_SIZES})")
+    failed = 0
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(_backfill_one, todo, chunksize=8))
+    else:
+        results = map(_backfill_one, todo)
+    for path, error in results:
+        if error:
+            failed += 1
+            print(f"cannot thumbnail {path}: {error}")
+    print(f"wrote thumbnails for {len(todo) - failed} images, {failed} failed")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Thumbnails of stored images")
+    parser.add_argument("--meta-db", default=DEFAULT_META_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("backfill", help="write missing thumbnails for every stored image")
+    p.add_argument("--force", action="store_true", help="rewrite thumbnails that already exist")
+    p.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args(argv)
+    {"backfill": cmd_backfill}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os
+import struct
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# One fixed-size record per vector operation: op (1 byte), vector id (int64), vector (dim float32)
+OP_ADD = b"A"
+OP_UPDATE = b"U"
+OP_DELETE = b"D"  # vector part is zeros
+_HEADER = struct.Struct("<cq")
+
+DURABILITY_MODES = ("fsync", "flush")
+
+
+class VectorLog:
+    """
+    Append-only log of index mutations since the last snapshot.
+    Records have a fixed size, so a torn write at the tail (crash mid-append) is detected
+    by length and dropped on replay.
+    """
+    def __init__(self, path: str, dim: int, durability: str = "fsync"):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {DURABILITY_MODES}, got {durability!r}")
+        self.path = path
+        self.dim = dim
+        self.durability = durability
+        self.record_size = _HEADER.size + 4 * dim
+        self._f = open(self.path, "ab")
+
+    def append(self, op: bytes, ids: List[int], vectors: Optional[np.ndarray] = None) -> None:
+        if vectors is None:
+            vectors = np.zeros((len(ids), self.dim), dtype=np.float32)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        buf = b"".join(_HEADER.pack(op, int(i)) + vec.tobytes() for i, vec in zip(ids, vectors))
+        self._f.write(buf)
+        self._f.flush()
+        if self.durability == "fsync":
+            os.fsync(self._f.fileno())
+
+    def size(self) -> int:
+        return self._f.tell()
+
+    def replay(self) -> Iterator[Tuple[bytes, int, np.ndarray]]:
+        """
+        Yield (op, vector_id, vector) for every complete record; a torn tail is truncated.
+        """
+        self._f.flush()
+        size = os.path.getsize(self.path)
+        complete = size - size % self.record_size
+        if complete != size:
+            print(f"vector log: dropping {size - complete} bytes of a torn record in {self.path}")
+            self._f.truncate(complete)
+            self._f.flush()
+        with open(self.path, "rb") as f:
+            while True:
+                rec = f.read(self.record_size)
+                if len(rec) < self.record_size:
+                    break
+                op, vec_id = _HEADER.unpack_from(rec)
+                vec = np.frombuffer(rec, dtype=np.float32, offset=_HEADER.size)
+                yield op, vec_id, vec
+
+    def drop_prefix(self, offset: int) -> None:
+        """
+        Forget records before `offset` (they are covered by a snapshot).
+        The remaining tail is copied to a new file that atomically replaces the log.
+        """
+        self._f.flush()
+        tmp = self.path + ".tmp"
+        with open(self.path, "rb") as src, open(tmp, "wb") as dst:
+            src.seek(offset)
+            while True:
+                chunk = src.read(1 << 20)
+                if not chunk:
+                    break
+                dst.write(chunk)
+            dst.flush()
+            os.fsync(dst.fileno())
+        self._f.close()
+        os.replace(tmp, self.path)
+        self._f = open(self.path, "ab")
+
+    def close(self) -> None:
+        if not self._f.closed:
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._f.close()
@@ -0,0 +1,51 @@
+"""
+Production server settings.
+
+    # one writer: owns the index files, handles ingests and edits
+    INDEX_ROLE=writer gunicorn -c gunicorn.conf.py app:app --bind 127.0.0.1:5001
+
+    # readers: serve searches, forward ingests/edits to the writer
+    INDEX_ROLE=reader INDEX_WRITER_URL=http://127.0.0.1:5001 WEB_WORKERS=4 \
+        gunicorn -c gunicorn.conf.py app:app --bind 0.0.0.0:5000
+
+Readers proxy writes to INDEX_WRITER_URL themselves, so it only has to be reachable from
+the readers; clients never see it. Readers search the writer's last snapshot: an upload
+becomes searchable there after the next snapshot (INDEX_SNAPSHOT_SECS, default 60s).
+
+The app is imported once in the master (preload) with the models loaded synchronously, then
+forked; workers share the model weights copy-on-write. The index and the caption queue are
+opened in each worker after fork, so the master never holds the writer's vector log or runs
+its snapshot and caption threads. Each worker gets an explicit torch / FAISS thread budget
+so the workers together use about one thread per core.
+"""
+import os
+
+INDEX_ROLE = os.environ.get("INDEX_ROLE", "writer")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+# The writer must be a single process: it owns the vector log and the snapshots
+workers = 1 if INDEX_ROLE == "writer" else int(os.environ.get("WEB_WORKERS", "2"))
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", "4"))
+timeout = int(os.environ.get("WEB_TIMEOUT", "120"))
+
+preload_app = True
+# app.py leaves the index to post_fork
+os.environ.setdefault("INDEX_OPEN_AFTER_FORK", "1")
+# ONNX Runtime sessions do not survive fork; with that backend each worker loads its own
+if os.environ.get("INFERENCE_BACKEND", "torch") != "onnx":
+    os.environ.setdefault("PRELOAD_MODELS", "1")
+
+# Intra-op threads per worker; default splits the cores evenly between workers
+THREADS_PER_WORKER = int(os.environ.get("TORCH_THREADS", "0")) or max(1, (os.cpu_count() or 1) // workers)
+
+
+def post_fork(server, worker):
+    from backend.embedding import set_thread_budget
+
+    set_thread_budget(THREADS_PER_WORKER)
+    if os.environ.get("INDEX_OPEN_AFTER_FORK") == "1":
+        from app import open_index
+
+        open_index()
+    server.log.info(f"worker {worker.pid}: role={INDEX_ROLE} threads={THREADS_PER_WORKER}")
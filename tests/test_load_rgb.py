@@ -0,0 +1,24 @@
+import pytest
+from PIL import Image
+
+embedding = pytest.importorskip("backend.embedding")
+
+
+@pytest.mark.parametrize("mode, ext", [
+    ("P", ".png"),
+    ("1", ".png"),
+    ("I;16", ".png"),
+    ("P", ".gif"),
+    ("RGB", ".jpg"),
+])
+def test_load_rgb_reduces_large_images_of_any_mode(tmp_path, mode, ext):
+    # Large enough that load_rgb reduces by an integer factor before converting to RGB
+    src = Image.new("RGB", (1000, 1000), (200, 30, 30))
+    src = src.convert("L").convert(mode) if mode == "I;16" else src.convert(mode)
+    path = tmp_path / f"image{ext}"
+    src.save(path)
+
+    img = embedding.load_rgb(str(path), min_side=448)
+
+    assert img.mode == "RGB"
+    assert img.size == (500, 500)